@@ -3,9 +3,13 @@
 """
 import pandas as pd
 import os
-import logging
 
-logger = logging.getLogger(__name__)
+from product_store import ProductStore
+from metrics import metrics
+from engine_logging import EngineLogger, sampled_request
+from top_k import top_k_frame
+
+logger = EngineLogger(__name__)
 
 
 class AccidentInsuranceEngine:
@@ -14,6 +18,7 @@ class AccidentInsuranceEngine:
     def __init__(self):
         """초기화 및 데이터 로드"""
         self.df = None
+        self.store = None
         self.load_data()
     
     def load_data(self):
@@ -30,12 +35,15 @@ class AccidentInsuranceEngine:
                 return
             
             self.df = pd.read_csv(csv_path)
+            self.store = ProductStore(self.df, numeric_columns=['male_premium'])
             logger.info(f"상해보험 데이터 로드 완료: {len(self.df)}개 상품")
             
         except Exception as e:
             logger.error(f"상해보험 데이터 로드 중 오류: {str(e)}")
             self.df = None
     
+    @metrics.tracked("accident")
+    @sampled_request
     def get_recommendations(self, age: int = 30, sex: str = "male", 
                           top_n: int = 5, sort_by: str = "default"):
         """
@@ -55,11 +63,10 @@ class AccidentInsuranceEngine:
             return []
         
         try:
-            # 데이터 복사
-            df = self.df.copy()
-            
-            # 나이 필터링 (현재는 모든 상품 포함)
-            df = df[df['male_premium'] > 0]
+            # 나이 필터링 (현재는 모든 상품 포함) - 후보 상품만 DataFrame으로 생성
+            idx = self.store.select(self.store.column('male_premium') > 0)
+            df = self.store.frame(idx)
+            metrics.mark("filter")
             
             # 성별에 따른 보험료 선택
             if sex.lower() == 'male':
@@ -81,17 +88,16 @@ class AccidentInsuranceEngine:
                 df['value_score'] * 0.4 + 
                 df['stability_score'] * 0.1
             )
+            metrics.mark("score")
             
-            # 정렬
+            # 정렬 기준 상위 N개 선택 (동점은 기존 순서 유지)
             if sort_by == "premium":
-                df = df.sort_values('avg_premium')
+                df = top_k_frame(df, 'avg_premium', top_n, ascending=True)
             elif sort_by == "coverage":
-                df = df.sort_values('coverage_amount', ascending=False)
+                df = top_k_frame(df, 'coverage_amount', top_n)
             else:
-                df = df.sort_values('final_score', ascending=False)
-            
-            # 상위 N개 선택
-            df = df.head(top_n)
+                df = top_k_frame(df, 'final_score', top_n)
+            metrics.mark("sort")
             
             # 결과를 딕셔너리 리스트로 변환
             recommendations = []
@@ -113,11 +119,13 @@ class AccidentInsuranceEngine:
                     "final_score": float(row['final_score'])
                 }
                 recommendations.append(rec)
+            metrics.mark("serialize")
             
-            logger.info(f"상해보험 추천 완료: {len(recommendations)}개 상품")
+            logger.debug("상해보험 추천 완료: %d개 상품", len(recommendations))
             return recommendations
             
         except Exception as e:
             logger.error(f"상해보험 추천 중 오류: {str(e)}")
+            metrics.mark_error()
             return []
 
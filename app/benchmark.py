@@ -0,0 +1,383 @@
+"""
+추천 엔진 오프라인 재생 벤치마크
+
+data/csv/users_improved.csv, users_simple.csv의 합성 사용자 프로필(2,000명)을
+모든 엔진에 순서대로 재생하여 다음을 측정하고 JSON으로 저장
+- 지연 시간 p50/p95/p99, 처리량(요청/초), 최대 RSS
+- 암보험 hit-rate@k: 사용자가 고른 selected_policy_id가 추천 상위 k개에 포함된 비율
+  (두 CSV는 프로필이 같고 selected_policy_id만 다르므로 한 번 재생하고 각각 계산)
+
+재생 방식
+- inprocess: 레지스트리의 엔진 메서드를 직접 호출 (엔진 자체 비용)
+- api: FastAPI 앱을 ASGI TestClient로 호출 (검증, 실행기, 캐시, 직렬화 포함)
+  엔진별로 캐시를 비우고 시작하므로 반복 프로필은 캐시 적중으로 집계됨
+
+프로필 -> 엔진 요청 변환
+- 암보험: 프로필 그대로 (/recommend/user-profile)
+- 연금/저축성: 월 예산 x10 (API 허용 범위), 가입 목적은 프로필 순서대로 순환
+- 상해: 나이, 성별
+- 종신: 희망 보험료 = 월 예산, 희망 보장금액 = 월 예산 x1,000 (1억 한도), 직업은 순환
+
+실행:
+    cd app
+    python benchmark.py                                  # 전체 재생 후 ../data/benchmark/에 저장
+    python benchmark.py --mode inprocess --engines cancer,life --limit 200
+    python benchmark.py --baseline ../data/benchmark/이전결과.json   # 이전 결과 대비 악화 시 종료 코드 1
+                                                                     # (프로필 수/k가 다르면 종료 코드 2)
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BASE_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_PATH = os.path.join(BASE_PATH, "data", "csv")
+RESULT_DIR = os.path.join(BASE_PATH, "data", "benchmark")
+
+# 재생할 프로필 파일 (프로필은 같고 selected_policy_id만 다름)
+PROFILE_FILES = {
+    "users_improved": "users_improved.csv",
+    "users_simple": "users_simple.csv",
+}
+
+ENGINE_KEYS = ("cancer", "pension", "savings", "accident", "life")
+PENSION_PURPOSES = ("연금준비", "단기저축", "세제혜택")
+SAVINGS_PURPOSES = ("단기저축", "장기저축", "노후자금", "교육자금")
+LIFE_JOBS = ("사무직", "학생", "무직", "기술직", "자영업", "간호사", "건설업", "개발자")
+
+# --baseline 비교 시 악화로 보는 기준
+LATENCY_TOLERANCE = 0.20   # p95 지연 시간 20% 이상 증가
+THROUGHPUT_TOLERANCE = 0.20  # 처리량 20% 이상 감소
+HIT_RATE_TOLERANCE = 0.01  # hit-rate 1%p 이상 감소
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================
+# 프로필 로드 및 요청 변환
+# ============================================================
+
+def load_profiles(limit: Optional[int] = None) -> Tuple[List[dict], Dict[str, List[int]]]:
+    """
+    프로필 목록과 파일별 selected_policy_id 목록 로드
+
+    Returns:
+        (프로필 딕셔너리 목록, {파일 이름: selected_policy_id 목록})
+    """
+    frames = {name: pd.read_csv(os.path.join(DATA_PATH, file)) for name, file in PROFILE_FILES.items()}
+    base = next(iter(frames.values()))
+    if limit:
+        base = base.head(limit)
+
+    profiles = [
+        {
+            "user_id": row.user_id,
+            "age": int(row.age),
+            "sex": str(row.sex),
+            "monthly_budget": int(row.monthly_budget),
+            "family_cancer_history": str(row.family_cancer_history).lower() == "true",
+            "preferred_coverage_period": str(row.preferred_coverage_period),
+        }
+        for row in base.itertuples(index=False)
+    ]
+    labels = {}
+    for name, df in frames.items():
+        # 파일마다 행 순서가 달라도 user_id로 맞춰 선택 상품만 사용
+        selected = df.set_index("user_id")["selected_policy_id"]
+        labels[name] = [int(selected[p["user_id"]]) for p in profiles]
+    return profiles, labels
+
+
+def build_case(engine_key: str, profile: dict, i: int, k: int) -> dict:
+    """
+    프로필 하나를 엔진 호출(inprocess)과 HTTP 요청(api)으로 변환
+
+    Returns:
+        {"method", "args", "kwargs", "path", "body"}
+    """
+    age, budget = profile["age"], profile["monthly_budget"]
+    male = profile["sex"] == "M"
+
+    if engine_key == "cancer":
+        from models import UserProfileRecommendationRequest
+        body = {
+            "age": age, "sex": profile["sex"], "monthly_budget": budget,
+            "family_cancer_history": profile["family_cancer_history"],
+            "preferred_coverage_period": profile["preferred_coverage_period"], "top_n": k
+        }
+        return {"method": "get_recommendations", "args": (UserProfileRecommendationRequest(**body),),
+                "kwargs": {}, "path": "/recommend/user-profile", "body": body}
+
+    if engine_key == "pension":
+        params = {"age": age, "monthly_budget": budget * 10,
+                  "purpose": PENSION_PURPOSES[i % len(PENSION_PURPOSES)], "top_n": k}
+        return {"method": "get_recommendations", "args": (), "kwargs": params,
+                "path": "/savings/recommend", "body": params}
+
+    if engine_key == "savings":
+        params = {"age": age, "monthly_budget": budget * 10,
+                  "purpose": SAVINGS_PURPOSES[i % len(SAVINGS_PURPOSES)], "top_n": k}
+        return {"method": "get_recommendations", "args": (), "kwargs": params,
+                "path": "/recommend/savings-insurance", "body": params}
+
+    if engine_key == "accident":
+        params = {"age": age, "sex": "male" if male else "female", "top_n": k, "sort_by": "default"}
+        return {"method": "get_recommendations", "args": (), "kwargs": params,
+                "path": "/recommend/accident", "body": params}
+
+    if engine_key == "life":
+        body = {"gender": "남자" if male else "여자", "age": age, "job": LIFE_JOBS[i % len(LIFE_JOBS)],
+                "desiredPremium": budget, "desiredCoverage": min(budget * 1000, 100000000),
+                "topk": k, "sortBy": "distance"}
+        kwargs = {"gender_input": body["gender"], "premium": body["desiredPremium"],
+                  "coverage": body["desiredCoverage"], "age": age, "job_text": body["job"],
+                  "k": k, "sort_by": "distance"}
+        return {"method": "recommend", "args": (), "kwargs": kwargs, "path": "/recommend/life", "body": body}
+
+    raise ValueError(f"알 수 없는 엔진: {engine_key}")
+
+
+def _policy_ids(recommendations) -> List[int]:
+    """추천 결과(모델 객체 또는 딕셔너리)의 policy_id 목록"""
+    ids = []
+    for item in recommendations or []:
+        value = item.get("policy_id") if isinstance(item, dict) else getattr(item, "policy_id", None)
+        if value is not None:
+            ids.append(int(value))
+    return ids
+
+
+# ============================================================
+# 측정
+# ============================================================
+
+def peak_rss_mb() -> Optional[float]:
+    """프로세스 최대 RSS (MB, 측정 불가 환경에서는 None)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux는 KB, macOS는 바이트 단위
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def summarize(latencies: List[float], elapsed: float, errors: int) -> dict:
+    """지연 시간 목록(초)을 요약 통계로 변환"""
+    ms = np.asarray(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed > 0 else 0.0,
+        "mean_ms": round(float(ms.mean()), 3) if len(ms) else 0.0,
+        "p50_ms": round(float(np.percentile(ms, 50)), 3) if len(ms) else 0.0,
+        "p95_ms": round(float(np.percentile(ms, 95)), 3) if len(ms) else 0.0,
+        "p99_ms": round(float(np.percentile(ms, 99)), 3) if len(ms) else 0.0,
+        "max_ms": round(float(ms.max()), 3) if len(ms) else 0.0,
+    }
+
+
+def hit_rates(results: List[List[int]], labels: Dict[str, List[int]], k: int) -> Dict[str, float]:
+    """파일별 hit-rate@k (selected_policy_id가 상위 k개 안에 있는 프로필 비율)"""
+    return {
+        name: round(float(np.mean([sel in ids[:k] for sel, ids in zip(selected, results)])), 4)
+        if results else 0.0
+        for name, selected in labels.items()
+    }
+
+
+def replay(engine_key: str, cases: List[dict], call: Callable[[dict], Any], labels, k: int) -> dict:
+    """케이스 목록을 순서대로 호출하여 지연 시간과 hit-rate 측정"""
+    latencies, ranked, errors = [], [], 0
+    start = time.perf_counter()
+    for case in cases:
+        t0 = time.perf_counter()
+        try:
+            result = call(case)
+        except Exception as e:
+            logger.warning(f"{engine_key} 요청 실패: {e}")
+            result, errors = None, errors + 1
+        latencies.append(time.perf_counter() - t0)
+        ranked.append(_policy_ids(result) if engine_key == "cancer" else [])
+    elapsed = time.perf_counter() - start
+
+    summary = summarize(latencies, elapsed, errors)
+    if engine_key == "cancer":
+        summary["hit_rate_at_k"] = hit_rates(ranked, labels, k)
+    summary["peak_rss_mb"] = peak_rss_mb()
+    return summary
+
+
+def run_inprocess(engine_keys, profiles, labels, k: int) -> Dict[str, dict]:
+    """엔진 메서드 직접 호출"""
+    from engine_registry import engine_registry
+
+    if engine_registry.current.version == 0:
+        engine_registry.load()
+
+    results = {}
+    for key in engine_keys:
+        engine = engine_registry.get(key)
+        if engine is None:
+            results[key] = {"error": "엔진 초기화 실패"}
+            continue
+        cases = [build_case(key, p, i, k) for i, p in enumerate(profiles)]
+        call = lambda case, engine=engine: getattr(engine, case["method"])(*case["args"], **case["kwargs"])
+        results[key] = replay(key, cases, call, labels, k)
+        print(f"  inprocess {key:<9} {_format_line(results[key])}")
+    return results
+
+
+def run_api(engine_keys, profiles, labels, k: int) -> Dict[str, dict]:
+    """FastAPI 앱을 ASGI TestClient로 호출 (엔진별로 캐시를 비우고 시작)"""
+    from fastapi.testclient import TestClient
+    from engine_registry import engine_registry
+    from helpers import recommendation_cache
+    from main import app
+
+    results = {}
+    with TestClient(app) as client:
+        engine_registry.wait_ready()  # 앱 시작 시 엔진은 백그라운드에서 로드됨
+        for key in engine_keys:
+            cases = [build_case(key, p, i, k) for i, p in enumerate(profiles)]
+            recommendation_cache.clear()
+            before = recommendation_cache.stats()
+
+            def call(case):
+                response = client.post(case["path"], json=case["body"])
+                if response.status_code != 200:
+                    raise RuntimeError(f"HTTP {response.status_code}: {response.text[:200]}")
+                return response.json().get("recommendations", [])
+
+            results[key] = replay(key, cases, call, labels, k)
+            after = recommendation_cache.stats()
+            hits = after.get("hits", 0) - before.get("hits", 0)
+            misses = after.get("misses", 0) - before.get("misses", 0)
+            results[key]["cache_hit_rate"] = round(hits / (hits + misses), 4) if hits + misses else 0.0
+            print(f"  api       {key:<9} {_format_line(results[key])}")
+    return results
+
+
+def _format_line(summary: dict) -> str:
+    if "error" in summary:
+        return summary["error"]
+    line = (f"p50 {summary['p50_ms']:8.3f}ms  p95 {summary['p95_ms']:8.3f}ms  "
+            f"p99 {summary['p99_ms']:8.3f}ms  {summary['throughput_rps']:9.1f} req/s")
+    if "hit_rate_at_k" in summary:
+        line += "  hit@k " + ", ".join(f"{n}={v:.3f}" for n, v in summary["hit_rate_at_k"].items())
+    if summary["errors"]:
+        line += f"  오류 {summary['errors']}건"
+    return line
+
+
+# ============================================================
+# 결과 저장 / 비교
+# ============================================================
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_PATH, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+def compare(baseline: dict, current: dict) -> List[str]:
+    """이전 결과 대비 악화 항목 목록 (p95 지연, 처리량, hit-rate)"""
+    regressions = []
+    for mode, engines in current.get("results", {}).items():
+        for key, now in engines.items():
+            before = baseline.get("results", {}).get(mode, {}).get(key)
+            if not before or "error" in before or "error" in now:
+                continue
+            label = f"{mode}/{key}"
+            if before["p95_ms"] > 0 and now["p95_ms"] > before["p95_ms"] * (1 + LATENCY_TOLERANCE):
+                regressions.append(f"{label} p95 {before['p95_ms']:.3f}ms -> {now['p95_ms']:.3f}ms")
+            if now["throughput_rps"] < before["throughput_rps"] * (1 - THROUGHPUT_TOLERANCE):
+                regressions.append(f"{label} 처리량 {before['throughput_rps']:.1f} -> {now['throughput_rps']:.1f} req/s")
+            for name, rate in now.get("hit_rate_at_k", {}).items():
+                old_rate = before.get("hit_rate_at_k", {}).get(name)
+                if old_rate is not None and rate < old_rate - HIT_RATE_TOLERANCE:
+                    regressions.append(f"{label} hit@k({name}) {old_rate:.3f} -> {rate:.3f}")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="추천 엔진 오프라인 재생 벤치마크")
+    parser.add_argument("--mode", choices=["all", "inprocess", "api"], default="all")
+    parser.add_argument("--engines", default=",".join(ENGINE_KEYS), help="쉼표로 구분한 엔진 키")
+    parser.add_argument("--limit", type=int, default=None, help="재생할 프로필 수 (기본: 전체)")
+    parser.add_argument("-k", "--top-k", type=int, default=5, help="추천 개수 및 hit-rate@k의 k")
+    parser.add_argument("--output", default=None, help="결과 JSON 경로 (기본: data/benchmark/)")
+    parser.add_argument("--baseline", default=None, help="비교할 이전 결과 JSON")
+    args = parser.parse_args(argv)
+
+    # 폴백 경고가 요청마다 출력되지 않도록 기본 ERROR (앱 시작 시 setup_logging도 같은 값 사용)
+    os.environ.setdefault("LOG_LEVEL", "ERROR")
+    logging.basicConfig(level=os.environ["LOG_LEVEL"].upper())
+    engine_keys = [key.strip() for key in args.engines.split(",") if key.strip()]
+    unknown = set(engine_keys) - set(ENGINE_KEYS)
+    if unknown:
+        parser.error(f"알 수 없는 엔진: {', '.join(sorted(unknown))}")
+
+    profiles, labels = load_profiles(args.limit)
+    print(f"프로필 {len(profiles)}개, 엔진 {', '.join(engine_keys)}, k={args.top_k}")
+
+    results = {}
+    if args.mode in ("all", "inprocess"):
+        results["inprocess"] = run_inprocess(engine_keys, profiles, labels, args.top_k)
+    if args.mode in ("all", "api"):
+        results["api"] = run_api(engine_keys, profiles, labels, args.top_k)
+
+    commit = _git_commit()
+    report = {
+        "commit": commit,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "profiles": len(profiles),
+        "top_k": args.top_k,
+        "peak_rss_mb": peak_rss_mb(),
+        "results": results,
+    }
+
+    output = args.output or os.path.join(
+        RESULT_DIR, f"benchmark_{datetime.now():%Y%m%d_%H%M%S}_{commit or 'local'}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"결과 저장: {output} (최대 RSS {report['peak_rss_mb']}MB)")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if (baseline.get("profiles"), baseline.get("top_k")) != (report["profiles"], report["top_k"]):
+            print(f"비교 불가: 이전 결과는 프로필 {baseline.get('profiles')}개, k={baseline.get('top_k')}")
+            return 2
+        regressions = compare(baseline, report)
+        if regressions:
+            print("성능 악화:")
+            for line in regressions:
+                print(f"  - {line}")
+            return 1
+        print("이전 결과 대비 악화 없음")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,62 @@
 import pandas as pd
 import numpy as np
 import os
+import random
 from typing import List
 from models import ProductRecommendation
+from product_store import ProductStore
+from metrics import metrics
+from engine_logging import EngineLogger, sampled_request
+from top_k import top_k_frame
+from interval_index import IntervalIndex
+from snapshot import load_snapshot, save_snapshot
+
+logger = EngineLogger(__name__)
+
+# 여성 고객에게 가산점을 주는 안정적인 보험회사
+STABLE_COMPANIES = ['한화생명', '교보생명', '삼성생명']
+
+# policy_id 기준으로 상품에 연결하는 부가 테이블
+ELIGIBILITY_FILE = "cancer_eligibility.csv"
+COVERAGES_FILE = "cancer_coverages.csv"
+
+# 다양성 랜덤 점수 시드 (요청마다 같은 수열을 사용하여 결과를 결정적으로 유지)
+RANDOM_BONUS_SEED = 42
+
+
+def _random_bonus_sequence(size: int, seed: int = RANDOM_BONUS_SEED) -> np.ndarray:
+    """
+    다양성 랜덤 점수(0~5) 수열 생성
+    
+    요청마다 같은 시드로 처음부터 뽑으므로 로드 시 상품 수만큼 한 번 만들고
+    요청에서는 후보 수만큼 앞부분만 잘라 사용.
+    random.Random(seed)의 MT19937 상태를 NumPy Generator로 옮겨
+    기존 rng.uniform(0, 5) 반복과 같은 값을 생성
+    """
+    _, internal_state, _ = random.Random(seed).getstate()
+    bit_generator = np.random.MT19937()
+    bit_generator.state = {
+        'bit_generator': 'MT19937',
+        'state': {'key': np.array(internal_state[:-1], dtype=np.uint32), 'pos': internal_state[-1]}
+    }
+    bonus = np.random.Generator(bit_generator).uniform(0, 5, size)
+    bonus.setflags(write=False)
+    return bonus
+
 
 class PersonalizedCancerEngine:
     """맞춤형 암보험 추천 엔진 - 사용자 특성에 따른 강화된 개인화"""
     
+    # 전처리 스냅샷 이름 / 버전 (_preprocess_data 변경 시 버전 증가)
+    SNAPSHOT_NAME = "cancer"
+    SNAPSHOT_VERSION = 2
+    
     def __init__(self):
         self.df = None
+        self.store = None
+        self.random_bonus = None
+        self.coverage_details = {}
+        self.age_index = None
         self.load_data()
     
     def load_data(self):
@@ -19,25 +67,32 @@ class PersonalizedCancerEngine:
             data_path = os.path.join(base_path, "data", "csv")
             file_path = os.path.join(data_path, "cancer.csv")
             
-            print(f"맞춤형 엔진 데이터 파일 경로: {file_path}")
-            print(f"파일 존재 여부: {os.path.exists(file_path)}")
+            logger.info("맞춤형 엔진 데이터 파일 경로: %s", file_path)
             
             if not os.path.exists(file_path):
-                print(f"파일이 존재하지 않습니다: {file_path}")
+                logger.error("파일이 존재하지 않습니다: %s", file_path)
                 self.df = None
                 return
             
-            self.df = pd.read_csv(file_path)
-            print(f"맞춤형 암보험 데이터 로드 완료: {len(self.df)}개 상품")
-            print(f"컬럼: {list(self.df.columns)}")
+            # 최신 스냅샷이 있으면 CSV 파싱과 전처리 생략
+            self.df = load_snapshot(self.SNAPSHOT_NAME, file_path, self.SNAPSHOT_VERSION)
+            if self.df is not None:
+                logger.info("맞춤형 암보험 스냅샷 로드 완료: %d개 상품", len(self.df))
+            else:
+                self.df = pd.read_csv(file_path)
+                logger.info("맞춤형 암보험 데이터 로드 완료: %d개 상품", len(self.df))
+                logger.debug("컬럼: %s", list(self.df.columns))
+                
+                # 데이터 전처리
+                self._preprocess_data()
+                save_snapshot(self.SNAPSHOT_NAME, self.df, file_path, self.SNAPSHOT_VERSION)
             
-            # 데이터 전처리
-            self._preprocess_data()
+            # 가입 조건 / 보장 내역 / 가격 지수 연결 (작은 테이블이므로 스냅샷과 별도로 매번 로드)
+            self._load_policy_tables(data_path)
+            self._build_store()
             
         except Exception as e:
-            print(f"맞춤형 엔진 데이터 로드 중 오류: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("맞춤형 엔진 데이터 로드 중 오류: %s", e)
             self.df = None
     
     def _preprocess_data(self):
@@ -65,35 +120,115 @@ class PersonalizedCancerEngine:
         self.df['female_premium'] = pd.to_numeric(self.df['female_premium'], errors='coerce').fillna(0)
         self.df['avg_premium'] = (self.df['male_premium'] + self.df['female_premium']) / 2
         
-        print(f"맞춤형 엔진 데이터 전처리 완료 - coverage_amount 범위: {self.df['coverage_amount'].min():,} ~ {self.df['coverage_amount'].max():,}")
-        print(f"male_premium 범위: {self.df['male_premium'].min():,.0f} ~ {self.df['male_premium'].max():,.0f}")
+        # 개인화 점수용 플래그 컬럼 (요청마다 문자열 검사를 반복하지 않도록 미리 계산)
+        self.df['is_female_product'] = self.df['product_name'].astype(str).str.contains('여성|여자')
+        self.df['is_stable_company'] = self.df['insurance_company'].isin(STABLE_COMPANIES)
+        
+        # 회사별 다양성 점수용 정수 코드 (회사 정보가 없으면 -1)
+        self.df['company_code'] = pd.factorize(self.df['insurance_company'])[0]
+        
+        if logger.debug_enabled():
+            logger.debug("맞춤형 엔진 데이터 전처리 완료 - coverage_amount 범위: %s ~ %s",
+                         f"{self.df['coverage_amount'].min():,}", f"{self.df['coverage_amount'].max():,}")
+            logger.debug("male_premium 범위: %s ~ %s",
+                         f"{self.df['male_premium'].min():,.0f}", f"{self.df['male_premium'].max():,.0f}")
+    
+    @staticmethod
+    def _read_policy_table(data_path: str, file_name: str):
+        """policy_id 기준 부가 테이블 로드 (없거나 읽기 실패 시 None)"""
+        path = os.path.join(data_path, file_name)
+        if not os.path.exists(path):
+            logger.warning("부가 테이블이 없습니다: %s", path)
+            return None
+        try:
+            table = pd.read_csv(path)
+            table['policy_id'] = pd.to_numeric(table['policy_id'], errors='coerce')
+            return table.dropna(subset=['policy_id'])
+        except Exception as e:
+            logger.error("부가 테이블 로드 중 오류 (%s): %s", file_name, e)
+            return None
+    
+    def _load_policy_tables(self, data_path: str):
+        """
+        가입 조건 / 보장 내역 테이블을 policy_id 기준으로 상품에 연결
+        
+        - 가입 조건: 상품 행마다 가입 나이 구간과 가입 한도 컬럼 (정보가 없으면 제한 없음)
+        - 보장 내역: policy_id -> 보장 내용 문자열 목록 (coverage_id 순)
+        """
+        policy_ids = pd.to_numeric(self.df['policy_id'], errors='coerce')
+        
+        # 가입 조건 구간 (가입 한도 0은 미기재로 보고 제한 없음 처리)
+        eligibility = self._read_policy_table(data_path, ELIGIBILITY_FILE)
+        if eligibility is not None:
+            eligibility = eligibility.drop_duplicates('policy_id').set_index('policy_id')
+        for col, open_value in (('min_age', -np.inf), ('max_age', np.inf), ('max_coverage', np.inf)):
+            if eligibility is not None:
+                values = pd.to_numeric(policy_ids.map(eligibility[col]), errors='coerce')
+                if col == 'max_coverage':
+                    values = values.where(values > 0)
+            else:
+                values = pd.Series(np.nan, index=self.df.index)
+            self.df[f'eligible_{col}'] = values.fillna(open_value).to_numpy(dtype=float)
+        
+        # 보장 내역
+        coverages = self._read_policy_table(data_path, COVERAGES_FILE)
+        self.coverage_details = {}
+        if coverages is not None:
+            coverages = coverages.sort_values(['policy_id', 'coverage_id'], kind='stable')
+            for policy_id, group in coverages.groupby('policy_id', sort=False):
+                self.coverage_details[int(policy_id)] = tuple(
+                    f"{name} ({amount})" if pd.notna(amount) else str(name)
+                    for name, amount in zip(group['coverage_name'], group['payment_amount'])
+                )
+        
+        logger.info("맞춤형 엔진 부가 테이블 연결 완료: 가입조건 %d개, 보장내역 %d개 상품",
+                    0 if eligibility is None else len(eligibility), len(self.coverage_details))
     
+    def _build_store(self):
+        """요청별 필터링에 사용할 컬럼형 저장소 생성"""
+        if self.df is None or self.df.empty:
+            return
+        
+        self.store = ProductStore(
+            self.df,
+            numeric_columns=['avg_premium', 'coverage_amount', 'eligible_max_coverage'],
+            categorical_columns=['renewal_cycle'],
+            flag_columns=['is_female_product', 'is_stable_company']
+        )
+        # 가입 나이 구간 인덱스 (나이 -> 가입 가능한 상품 행)
+        self.age_index = IntervalIndex(self.df['eligible_min_age'], self.df['eligible_max_age'])
+        self.random_bonus = _random_bonus_sequence(len(self.df))
+    
+    @metrics.tracked("cancer")
+    @sampled_request
     def get_recommendations(self, request) -> List[ProductRecommendation]:
         """맞춤형 암보험 상품 추천 - 강화된 개인화 로직"""
         if self.df is None or self.df.empty:
-            print("맞춤형 엔진 데이터프레임이 비어있습니다.")
+            logger.warning("맞춤형 엔진 데이터프레임이 비어있습니다.")
             return []
         
-        print(f"맞춤형 엔진 전체 데이터: {len(self.df)}개")
+        logger.debug("맞춤형 엔진 전체 데이터: %d개", len(self.df))
         
         # top_n 기본값 설정
         top_n = getattr(request, 'top_n', 5)
         if top_n is None:
             top_n = 5
         
-        print(f"맞춤형 엔진 요청된 추천 상품 수: {top_n}개")
+        logger.debug("맞춤형 엔진 요청된 추천 상품 수: %d개", top_n)
         
         # 조건에 따른 필터링
         filtered_df = self._filter_products_personalized(request)
-        print(f"맞춤형 엔진 필터링 후 데이터: {len(filtered_df)}개")
+        metrics.mark("filter")
+        logger.debug("맞춤형 엔진 필터링 후 데이터: %d개", len(filtered_df))
         
         # 강화된 개인화 점수 계산
         scored_df = self._calculate_personalized_scores(filtered_df, request)
-        print(f"맞춤형 엔진 점수 계산 완료: {len(scored_df)}개")
+        logger.debug("맞춤형 엔진 점수 계산 완료: %d개", len(scored_df))
         
-        # 상위 N개 선택
-        top_products = scored_df.head(top_n)
-        print(f"맞춤형 엔진 최종 추천 상품: {len(top_products)}개")
+        # 상위 N개 선택 (점수 내림차순, 동점은 후보 순서 유지)
+        top_products = top_k_frame(scored_df, 'final_score', top_n)
+        metrics.mark("sort")
+        logger.debug("맞춤형 엔진 최종 추천 상품: %d개", len(top_products))
         
         recommendations = []
         for i, (_, row) in enumerate(top_products.iterrows()):
@@ -116,80 +251,107 @@ class PersonalizedCancerEngine:
                     value_score=float(row.get('value_score', 0.0)),
                     stability_score=float(row.get('stability_score', 0.0)),
                     final_score=float(row.get('final_score', 0.0)),
-                    coverage_details=[f"암진단금 {coverage_amount:,}원", f"월 보험료 {int(avg_premium):,}원", "암입원금", "암수술금"]
+                    coverage_details=self._coverage_details(row, coverage_amount, avg_premium)
                 )
                 recommendations.append(recommendation)
-                print(f"맞춤형 추천 상품 {i+1}: {row.get('product_name', '정보없음')}")
+                logger.debug("맞춤형 추천 상품 %d: %s", i + 1, row.get('product_name', '정보없음'))
                 
             except Exception as e:
-                print(f"맞춤형 ProductRecommendation 객체 생성 중 오류: {str(e)}")
+                logger.error("맞춤형 ProductRecommendation 객체 생성 중 오류: %s", e)
+                metrics.mark_error()
                 continue
         
-        print(f"맞춤형 엔진 총 추천 상품 {len(recommendations)}개 생성")
+        metrics.mark("serialize")
+        logger.debug("맞춤형 엔진 총 추천 상품 %d개 생성", len(recommendations))
         return recommendations
     
+    def _coverage_details(self, row, coverage_amount, avg_premium) -> List[str]:
+        """보장 내역 테이블의 상품별 보장 내용 (없으면 기본 요약)"""
+        try:
+            details = self.coverage_details.get(int(row.get('policy_id')))
+        except (TypeError, ValueError):
+            details = None
+        if details:
+            return list(details)
+        return [f"암진단금 {coverage_amount:,}원", f"월 보험료 {int(avg_premium):,}원", "암입원금", "암수술금"]
+    
     def _filter_products_personalized(self, request):
-        """맞춤형 필터링 - 사용자 특성에 따른 강화된 필터링"""
-        filtered_df = self.df.copy()
+        """맞춤형 필터링 - 사용자 특성에 따른 강화된 필터링 (인덱스 배열 기반)"""
+        store = self.store
+        avg_premium = store.column('avg_premium')
+        coverage_amount = store.column('coverage_amount')
+        
+        # 가입 나이 구간에 요청 나이가 포함되는 상품에서 시작 (나이 정보가 없으면 전체)
+        eligible_age = getattr(request, 'age', None)
+        if eligible_age is not None:
+            idx = self.age_index.stab(eligible_age)
+            logger.debug("가입 나이 필터링 (%s세): %d개", eligible_age, len(idx))
+        else:
+            idx = store.all_indices()
         
         # 나이 기반 필터링 강화
         age = getattr(request, 'age', 30)
         if age < 25:
             # 젊은 층: 저렴한 상품 선호
-            filtered_df = filtered_df[filtered_df['avg_premium'] <= 50000]
-            print(f"젊은 층 필터링 (25세 미만): {len(filtered_df)}개")
+            idx = store.select(avg_premium <= 50000, idx)
+            logger.debug("젊은 층 필터링 (25세 미만): %d개", len(idx))
         elif age >= 60:
             # 고령층: 높은 보장금액 선호
-            filtered_df = filtered_df[filtered_df['coverage_amount'] >= 20000000]
-            print(f"고령층 필터링 (60세 이상): {len(filtered_df)}개")
+            idx = store.select(coverage_amount >= 20000000, idx)
+            logger.debug("고령층 필터링 (60세 이상): %d개", len(idx))
         
         # 성별 기반 필터링
         sex = getattr(request, 'sex', 'M')
         if sex == 'F':
             # 여성: 여성 특화 상품 우선
-            female_products = filtered_df[
-                filtered_df['product_name'].str.contains('여성|여자', na=False, case=False)
-            ]
-            if len(female_products) > 0:
-                filtered_df = female_products
-                print(f"여성 특화 상품 필터링: {len(filtered_df)}개")
+            female_idx = store.select(store.column('is_female_product'), idx)
+            if len(female_idx) > 0:
+                idx = female_idx
+                logger.debug("여성 특화 상품 필터링: %d개", len(idx))
         
         # 예산 기반 필터링
         monthly_budget = getattr(request, 'monthly_budget', None)
         if monthly_budget:
             if monthly_budget < 20000:
                 # 저예산: 매우 저렴한 상품만
-                filtered_df = filtered_df[filtered_df['avg_premium'] <= 20000]
-                print(f"저예산 필터링 (2만원 미만): {len(filtered_df)}개")
+                idx = store.select(avg_premium <= 20000, idx)
+                logger.debug("저예산 필터링 (2만원 미만): %d개", len(idx))
             elif monthly_budget > 100000:
                 # 고예산: 프리미엄 상품
-                filtered_df = filtered_df[filtered_df['coverage_amount'] >= 30000000]
-                print(f"고예산 필터링 (10만원 초과): {len(filtered_df)}개")
+                idx = store.select(coverage_amount >= 30000000, idx)
+                logger.debug("고예산 필터링 (10만원 초과): %d개", len(idx))
         
         # 가족 암력 기반 필터링
         family_cancer_history = getattr(request, 'family_cancer_history', False)
         if family_cancer_history:
             # 가족 암력 있음: 높은 보장금액 선호
-            filtered_df = filtered_df[filtered_df['coverage_amount'] >= 25000000]
-            print(f"가족 암력 기반 필터링: {len(filtered_df)}개")
+            idx = store.select(coverage_amount >= 25000000, idx)
+            logger.debug("가족 암력 기반 필터링: %d개", len(idx))
         
         # 흡연 여부 기반 필터링
         smoker_flag = getattr(request, 'smoker_flag', 0)
         if smoker_flag == 1:
             # 흡연자: 높은 보장금액 선호
-            filtered_df = filtered_df[filtered_df['coverage_amount'] >= 20000000]
-            print(f"흡연자 필터링: {len(filtered_df)}개")
+            idx = store.select(coverage_amount >= 20000000, idx)
+            logger.debug("흡연자 필터링: %d개", len(idx))
         
         # 갱신 방식 필터링
         prefer_non_renewal = getattr(request, 'prefer_non_renewal', True)
         if prefer_non_renewal:
-            filtered_df = filtered_df[filtered_df['renewal_cycle'] == '비갱신형']
-            print(f"비갱신형 필터링: {len(filtered_df)}개")
+            idx = store.select(store.mask('renewal_cycle', '비갱신형'), idx)
+            logger.debug("비갱신형 필터링: %d개", len(idx))
         else:
-            filtered_df = filtered_df[filtered_df['renewal_cycle'] == '갱신형']
-            print(f"갱신형 필터링: {len(filtered_df)}개")
+            idx = store.select(store.mask('renewal_cycle', '갱신형'), idx)
+            logger.debug("갱신형 필터링: %d개", len(idx))
         
-        return filtered_df
+        # 가입 한도 필터링 (남은 후보의 가입 한도만 비교)
+        requested_coverage = getattr(request, 'min_coverage', None)
+        if requested_coverage:
+            idx = idx[store.column('eligible_max_coverage', idx) >= requested_coverage]
+            logger.debug("가입 한도 필터링 (%s원 이상): %d개", f"{requested_coverage:,}", len(idx))
+        
+        # 최종 후보만 DataFrame으로 생성
+        return store.frame(idx)
     
     def _calculate_personalized_scores(self, df, request):
         """강화된 개인화 점수 계산"""
@@ -199,11 +361,10 @@ class PersonalizedCancerEngine:
         # 사용자 특성에 따른 강화된 가중치
         weights = self._get_enhanced_weights(request)
         coverage_weight, value_weight, stability_weight, personalization_weight = weights
-        print(f"맞춤형 가중치 - 보장금액:{coverage_weight}, 가성비:{value_weight}, 안정성:{stability_weight}, 개인화:{personalization_weight}")
-        
-        # 점수 계산
-        df = df.copy()
+        logger.debug("맞춤형 가중치 - 보장금액:%s, 가성비:%s, 안정성:%s, 개인화:%s",
+                     coverage_weight, value_weight, stability_weight, personalization_weight)
         
+        # 점수 계산 (df는 필터링 단계에서 새로 만든 후보 DataFrame)
         # 1. 보장금액 점수 (높을수록 좋음)
         max_coverage = df['coverage_amount'].max()
         df['coverage_score'] = (df['coverage_amount'] / max_coverage * 100) if max_coverage > 0 else 0
@@ -233,26 +394,26 @@ class PersonalizedCancerEngine:
         )
         
         # 다양성을 위한 추가 점수
-        import random
-        random.seed(42)
-        
-        # 회사별 다양성 점수
-        df['diversity_bonus'] = 0
-        companies = df['insurance_company'].unique()
-        for i, company in enumerate(companies):
-            company_mask = df['insurance_company'] == company
-            df.loc[company_mask, 'diversity_bonus'] = (len(companies) - i) * 2
-        
-        # 랜덤 요소 추가 (맞춤형에서는 더 적게)
-        df['random_bonus'] = [random.uniform(0, 5) for _ in range(len(df))]
+        # 회사별 다양성 점수: 후보에서 처음 등장한 회사 순서대로 (회사 수 - 순위) * 2
+        company_codes = df['company_code'].to_numpy()
+        codes, first_pos, inverse = np.unique(company_codes, return_index=True, return_inverse=True)
+        rank = np.empty(len(codes), dtype=np.intp)
+        rank[np.argsort(first_pos)] = np.arange(len(codes))
+        diversity_bonus = (len(codes) - rank[inverse.reshape(-1)]) * 2
+        diversity_bonus[company_codes < 0] = 0  # 회사 정보가 없는 상품
+        df['diversity_bonus'] = diversity_bonus
+        
+        # 랜덤 요소 추가 (맞춤형에서는 더 적게) - 로드 시 만든 고정 수열의 앞부분 (요청 간 공유, 읽기 전용)
+        df['random_bonus'] = self.random_bonus[:len(df)]
         
         # 최종 점수에 다양성 요소 추가
         df['final_score'] = df['final_score'] + df['diversity_bonus'] + df['random_bonus']
         
-        # 점수 순으로 정렬
-        df = df.sort_values('final_score', ascending=False)
+        metrics.mark("score")
         
-        print(f"맞춤형 엔진 점수 계산 완료 - 최고점: {df['final_score'].max():.1f}, 최저점: {df['final_score'].min():.1f}")
+        if logger.debug_enabled():
+            logger.debug("맞춤형 엔진 점수 계산 완료 - 최고점: %.1f, 최저점: %.1f",
+                         df['final_score'].max(), df['final_score'].min())
         
         return df
     
@@ -331,7 +492,51 @@ class PersonalizedCancerEngine:
         return [coverage_weight, value_weight, stability_weight, personalization_weight]
     
     def _calculate_personalization_score(self, df, request):
-        """개인화 점수 계산"""
+        """개인화 점수 계산 (벡터화)"""
+        avg_premium = df['avg_premium'].to_numpy()
+        coverage_amount = df['coverage_amount'].to_numpy()
+        scores = np.zeros(len(df), dtype=np.int64)
+        
+        # 나이 기반 개인화
+        age = getattr(request, 'age', 30)
+        if age < 30:
+            # 젊은 층: 저렴한 상품에 높은 점수
+            scores += np.select([avg_premium < 30000, avg_premium < 50000], [20, 10], 0)
+        elif age >= 50:
+            # 중장년층: 높은 보장금액에 높은 점수
+            scores += np.select([coverage_amount > 30000000, coverage_amount > 20000000], [20, 10], 0)
+        
+        # 성별 기반 개인화
+        sex = getattr(request, 'sex', 'M')
+        if sex == 'F':
+            # 여성: 여성 특화 상품 / 안정적인 보험회사에 높은 점수
+            scores += np.where(df['is_female_product'].to_numpy(), 25, 0)
+            scores += np.where(df['is_stable_company'].to_numpy(), 15, 0)
+        
+        # 예산 기반 개인화
+        monthly_budget = getattr(request, 'monthly_budget', None)
+        if monthly_budget:
+            if monthly_budget < 30000:
+                # 저예산: 저렴한 상품에 높은 점수
+                scores += np.select([avg_premium <= monthly_budget, avg_premium <= monthly_budget * 1.5], [30, 15], 0)
+            elif monthly_budget > 80000:
+                # 고예산: 프리미엄 상품에 높은 점수
+                scores += np.select([coverage_amount > 40000000, coverage_amount > 30000000], [30, 15], 0)
+        
+        # 가족 암력 기반 개인화
+        family_cancer_history = getattr(request, 'family_cancer_history', False)
+        if family_cancer_history:
+            scores += np.select([coverage_amount > 35000000, coverage_amount > 25000000], [25, 15], 0)
+        
+        # 흡연 여부 기반 개인화
+        smoker_flag = getattr(request, 'smoker_flag', 0)
+        if smoker_flag == 1:
+            scores += np.select([coverage_amount > 30000000, coverage_amount > 20000000], [20, 10], 0)
+        
+        return np.minimum(scores, 100)  # 최대 100점으로 제한
+    
+    def _calculate_personalization_score_rowwise(self, df, request):
+        """개인화 점수 계산 (행 단위 참조 구현 - 벡터화 결과 검증용)"""
         personalization_scores = []
         
         for _, row in df.iterrows():
@@ -359,7 +564,7 @@ class PersonalizedCancerEngine:
                 if '여성' in str(row['product_name']) or '여자' in str(row['product_name']):
                     score += 25
                 # 여성: 안정적인 보험회사에 높은 점수
-                if row['insurance_company'] in ['한화생명', '교보생명', '삼성생명']:
+                if row['insurance_company'] in STABLE_COMPANIES:
                     score += 15
             
             # 예산 기반 개인화
@@ -399,3 +604,33 @@ class PersonalizedCancerEngine:
             personalization_scores.append(min(score, 100))  # 최대 100점으로 제한
         
         return personalization_scores
+
+
+# === 테스트 및 직접 실행용 ===
+if __name__ == "__main__":
+    # 벡터화된 개인화 점수가 행 단위 구현과 동일한지 검증
+    import itertools
+    import sys
+    from models import UserProfileRecommendationRequest
+    
+    print("=== 맞춤형 암보험 개인화 점수 검증 ===")
+    engine = PersonalizedCancerEngine()
+    
+    mismatches = 0
+    cases = itertools.product([20, 35, 55, 70], ['M', 'F'], [10000, 25000, 50000, 90000, 200000], [False, True], [0, 1])
+    for age, sex, budget, family, smoker in cases:
+        request = UserProfileRecommendationRequest(
+            age=age, sex=sex, monthly_budget=budget,
+            family_cancer_history=family, smoker_flag=smoker
+        )
+        expected = engine._calculate_personalization_score_rowwise(engine.df, request)
+        actual = engine._calculate_personalization_score(engine.df, request)
+        if list(actual) != expected:
+            mismatches += 1
+            print(f"불일치: age={age}, sex={sex}, budget={budget}, family={family}, smoker={smoker}")
+    
+    print(f"검증 완료: 불일치 {mismatches}건")
+    
+    # 불일치가 있으면 실패 종료 코드로 끝내 CI/스크립트에서 검출되도록 함
+    if mismatches:
+        sys.exit(1)
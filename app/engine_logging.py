@@ -0,0 +1,126 @@
+"""
+추천 엔진 로깅
+
+- 레벨: LOG_LEVEL(루트, 기본 INFO), ENGINE_LOG_LEVEL(엔진 모듈만, 미지정 시 루트를 따름)
+- 요청 샘플링: ENGINE_LOG_SAMPLE_RATE(0~1, 기본 1.0) 비율의 요청에서만 엔진 DEBUG 출력
+- 비동기 출력: setup_logging() 이후 로그 레코드는 큐에 넣기만 하고
+  별도 리스너 스레드가 실제 핸들러(stderr 등)에 기록
+
+엔진에서는 logging.getLogger 대신 EngineLogger를 사용:
+    logger = EngineLogger(__name__)
+    logger.debug("필터링 후 데이터: %d개", len(idx))   # 비활성/비샘플 요청이면 즉시 반환
+    if logger.debug_enabled():                         # 인자 계산이 비싼 경우
+        logger.debug("최고점: %.1f", df['final_score'].max())
+"""
+import contextvars
+import functools
+import logging
+import os
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+ENGINE_LOG_LEVEL = os.environ.get("ENGINE_LOG_LEVEL", "").upper()
+ENGINE_LOG_SAMPLE_RATE = float(os.environ.get("ENGINE_LOG_SAMPLE_RATE", 1.0))
+
+# 현재 요청이 디버그 출력 샘플에 포함되는지 여부 (요청 밖에서는 항상 출력)
+_sampled = contextvars.ContextVar("engine_log_sampled", default=True)
+
+_listener: Optional[QueueListener] = None
+
+
+class EngineLogger:
+    """엔진용 로거 - DEBUG는 요청 샘플링을 적용하고 나머지 레벨은 그대로 전달"""
+
+    def __init__(self, name: str):
+        self.logger = logging.getLogger(name)
+        if ENGINE_LOG_LEVEL:
+            self.logger.setLevel(ENGINE_LOG_LEVEL)
+
+    def debug_enabled(self) -> bool:
+        """현재 요청에서 DEBUG 출력이 필요한지 여부"""
+        return _sampled.get() and self.logger.isEnabledFor(logging.DEBUG)
+
+    def debug(self, msg, *args):
+        if _sampled.get() and self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(msg, *args, stacklevel=2)
+
+    def info(self, msg, *args):
+        self.logger.info(msg, *args, stacklevel=2)
+
+    def warning(self, msg, *args):
+        self.logger.warning(msg, *args, stacklevel=2)
+
+    def error(self, msg, *args):
+        self.logger.error(msg, *args, stacklevel=2)
+
+    def exception(self, msg, *args):
+        self.logger.exception(msg, *args, stacklevel=2)
+
+
+def sampled_request(func):
+    """엔진 요청 메서드 데코레이터 - 호출마다 DEBUG 출력 샘플 여부를 한 번 결정"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        token = _sampled.set(ENGINE_LOG_SAMPLE_RATE >= 1.0 or random.random() < ENGINE_LOG_SAMPLE_RATE)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _sampled.reset(token)
+    return wrapper
+
+
+def setup_logging(level: Optional[str] = None) -> QueueListener:
+    """
+    루트 로거를 큐 기반 비동기 출력으로 설정 (앱 시작 시 한 번 호출)
+
+    Args:
+        level: 루트 로그 레벨 (기본: LOG_LEVEL 환경변수 또는 INFO)
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    logging.basicConfig(level=(level or os.environ.get("LOG_LEVEL", "INFO")).upper())
+    root = logging.getLogger()
+    handlers = root.handlers[:]
+    for handler in handlers:
+        root.removeHandler(handler)
+
+    log_queue = queue.SimpleQueue()
+    root.addHandler(QueueHandler(log_queue))
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def shutdown_logging():
+    """남은 로그를 모두 기록하고 리스너 종료 (앱 종료 시 호출)"""
+    global _listener
+    if _listener is None:
+        return
+    listener, _listener = _listener, None
+    listener.stop()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        if isinstance(handler, QueueHandler):
+            root.removeHandler(handler)
+    for handler in listener.handlers:
+        root.addHandler(handler)
+
+
+def init_worker_logging():
+    """
+    프로세스 풀 워커 초기화 - 리스너 스레드가 없는 자식 프로세스에서는
+    큐 대신 실제 핸들러로 직접 기록
+    """
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        if isinstance(handler, QueueHandler):
+            root.removeHandler(handler)
+    if _listener is not None:
+        for handler in _listener.handlers:
+            root.addHandler(handler)
+    if not root.handlers:
+        logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO").upper())
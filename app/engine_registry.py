@@ -0,0 +1,315 @@
+"""
+추천 엔진 레지스트리
+
+모든 엔진을 하나의 버전 스냅샷(EngineSet)으로 묶어 보관하고,
+재로딩 시 새 스냅샷을 백그라운드에서 전부 만든 뒤 참조 하나만 교체하여
+진행 중인 요청은 이전 버전으로 끝까지 처리되도록 함
+
+앱 시작 시에는 엔진들을 스레드 풀에서 동시에 생성하고(ENGINE_INIT_WORKERS) 준비된 엔진부터
+바로 공개하여 느린 엔진(종신보험 KNN 등)을 기다리지 않고 나머지 엔드포인트를 먼저 처리할 수 있음
+재로딩은 엔진별 빌드 시간과 메모리 증가량을 보고하도록 순차로 생성
+"""
+import asyncio
+import importlib
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Callable, Dict, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 앱 시작 시 엔진 동시 생성 스레드 수 (1이면 순차 생성, 순차 생성 시에만 엔진별 메모리 증가량 측정)
+ENGINE_INIT_WORKERS = int(os.environ.get("ENGINE_INIT_WORKERS", 5))
+# 1이면 앱 시작 시 모든 엔진이 준비될 때까지 대기 (기본: 백그라운드 로드)
+ENGINE_STARTUP_WAIT = os.environ.get("ENGINE_STARTUP_WAIT", "0") == "1"
+
+
+def _rss_bytes() -> Optional[int]:
+    """현재 프로세스 상주 메모리(RSS) - /proc이 없는 환경에서는 None"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+@dataclass(frozen=True)
+class EngineSpec:
+    """엔진 생성 정보"""
+    key: str
+    module_name: str
+    class_name: str
+    display_name: str
+
+
+# 레지스트리에서 관리하는 엔진 목록 (키 -> 엔진 클래스)
+ENGINE_SPECS: Tuple[EngineSpec, ...] = (
+    EngineSpec("pension", "pension_engine", "SavingsRecommendationEngine", "연금보험 추천 엔진"),
+    EngineSpec("cancer", "cancer_engine", "PersonalizedCancerEngine", "암보험 추천 엔진"),
+    EngineSpec("savings", "savings_engine", "SavingsInsuranceEngine", "저축성보험 추천 엔진"),
+    EngineSpec("life", "life_engine", "LifeInsuranceEngine", "종신보험 KNN 추천 엔진"),
+    EngineSpec("accident", "accident_engine", "AccidentInsuranceEngine", "상해보험 추천 엔진"),
+)
+
+
+@dataclass(frozen=True)
+class EngineSet:
+    """한 번의 빌드로 만들어진 엔진 묶음 (생성 후 변경하지 않음)"""
+    version: int
+    engines: Mapping[str, object]
+    build_report: Mapping[str, dict] = field(default_factory=dict)
+    built_at: float = 0.0
+    build_seconds: float = 0.0
+    memory_delta_mb: Optional[float] = None
+
+    def get(self, key: str):
+        """엔진 조회 (초기화 실패 시 None)"""
+        return self.engines.get(key)
+
+
+class EngineRegistry:
+    """버전별 엔진 스냅샷 보관 및 원자적 교체"""
+
+    def __init__(self, specs: Tuple[EngineSpec, ...] = ENGINE_SPECS, init_workers: int = ENGINE_INIT_WORKERS):
+        self.specs = specs
+        self.init_workers = max(1, init_workers)
+        self._current = EngineSet(version=0, engines=MappingProxyType({}))
+        self._reload_lock = threading.Lock()
+        self._building: Dict[str, float] = {}  # 생성 중인 엔진 키 -> 시작 시각
+        self._ready = threading.Event()
+
+    @property
+    def current(self) -> EngineSet:
+        """현재 버전 스냅샷 (요청 처리 시작 시 한 번 읽어 끝까지 사용)"""
+        return self._current
+
+    def get(self, key: str):
+        """현재 버전의 엔진 조회"""
+        return self._current.get(key)
+
+    def _build_engine(self, spec: EngineSpec, reload_module: bool,
+                      measure_memory: bool = True) -> Tuple[Optional[object], dict]:
+        """
+        엔진 하나를 생성하고 빌드 시간과 메모리(RSS) 증가량 측정
+        
+        동시 생성 중에는 다른 엔진의 할당이 섞이므로 measure_memory=False로 메모리는 측정하지 않음
+        """
+        self._building[spec.key] = time.time()
+        rss_before = _rss_bytes() if measure_memory else None
+        start = time.perf_counter()
+        try:
+            if reload_module and spec.module_name in sys.modules:
+                importlib.reload(sys.modules[spec.module_name])
+            module = importlib.import_module(spec.module_name)
+            engine = getattr(module, spec.class_name)()
+            error = None
+        except Exception as e:
+            engine = None
+            error = str(e)
+        elapsed = time.perf_counter() - start
+        rss_after = _rss_bytes() if measure_memory else None
+        self._building.pop(spec.key, None)
+
+        report = {
+            "name": spec.display_name,
+            "success": engine is not None,
+            "build_seconds": round(elapsed, 4),
+            "memory_delta_mb": (
+                round((rss_after - rss_before) / (1024 * 1024), 2)
+                if rss_before is not None and rss_after is not None else None
+            )
+        }
+        if error is not None:
+            report["error"] = error
+        return engine, report
+
+    def build(self, reload_modules: bool = False, parallel: bool = False,
+              on_ready: Optional[Callable[[EngineSet], None]] = None) -> EngineSet:
+        """
+        모든 엔진으로 새 스냅샷 생성 (현재 스냅샷은 건드리지 않음)
+
+        빌드에 실패한 엔진은 이전 버전의 인스턴스를 그대로 가져감
+
+        Args:
+            reload_modules: 엔진 모듈을 다시 import할지 여부 (코드 변경 반영)
+            parallel: init_workers개 스레드에서 동시에 생성 (엔진별 메모리 증가량은 측정하지 않음)
+            on_ready: 엔진 하나가 끝날 때마다 지금까지 완성된 엔진만 담은 부분 스냅샷으로 호출
+        """
+        previous = self._current
+        version = previous.version + 1
+        engines: Dict[str, object] = {}
+        report: Dict[str, dict] = {}
+        parallel = parallel and self.init_workers > 1 and len(self.specs) > 1
+        rss_before = _rss_bytes()
+        start = time.perf_counter()
+
+        def collect(spec: EngineSpec, engine, spec_report: dict):
+            if engine is None:
+                logger.warning(f"✗ {spec.display_name} 초기화 실패: {spec_report.get('error')}")
+                engine = previous.get(spec.key)
+                spec_report["kept_previous"] = engine is not None
+            else:
+                logger.info(f"✓ {spec.display_name} 초기화 완료 ({spec_report['build_seconds']:.2f}초)")
+            engines[spec.key] = engine
+            report[spec.key] = spec_report
+            if on_ready is not None:
+                on_ready(EngineSet(
+                    version=version,
+                    engines=MappingProxyType(dict(engines)),
+                    build_report=MappingProxyType(dict(report)),
+                    built_at=time.time()
+                ))
+
+        if parallel:
+            with ThreadPoolExecutor(max_workers=min(self.init_workers, len(self.specs)),
+                                    thread_name_prefix="engine-init") as pool:
+                futures = {
+                    pool.submit(self._build_engine, spec, reload_modules, False): spec
+                    for spec in self.specs
+                }
+                for future in as_completed(futures):
+                    collect(futures[future], *future.result())
+        else:
+            for spec in self.specs:
+                collect(spec, *self._build_engine(spec, reload_modules))
+
+        # 스냅샷의 엔진 순서는 완료 순서와 관계없이 ENGINE_SPECS 순서로 고정
+        rss_after = _rss_bytes()
+        return EngineSet(
+            version=version,
+            engines=MappingProxyType({spec.key: engines.get(spec.key) for spec in self.specs}),
+            build_report=MappingProxyType({spec.key: report[spec.key] for spec in self.specs}),
+            built_at=time.time(),
+            build_seconds=round(time.perf_counter() - start, 4),
+            memory_delta_mb=(
+                round((rss_after - rss_before) / (1024 * 1024), 2)
+                if rss_before is not None and rss_after is not None else None
+            )
+        )
+
+    def publish(self, engine_set: EngineSet):
+        """새 스냅샷으로 교체 (참조 대입 한 번이므로 원자적)"""
+        self._current = engine_set
+        logger.info(f"엔진 스냅샷 v{engine_set.version} 적용")
+
+    def load(self, reload_modules: bool = False, progressive: bool = False) -> EngineSet:
+        """
+        빌드 후 즉시 교체 (동시 재로딩은 한 번에 하나만 허용)
+
+        Args:
+            reload_modules: 엔진 모듈을 다시 import할지 여부
+            progressive: 엔진을 동시에 생성하고 하나씩 완성될 때마다 바로 공개 (앱 시작 시 사용).
+                False면 순차로 생성하여 전체가 완성된 뒤 한 번에 교체 (재로딩 시 사용)
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            raise RuntimeError("이미 재로딩이 진행 중입니다.")
+        try:
+            on_ready = self._publish_partial if progressive else None
+            engine_set = self.build(reload_modules=reload_modules, parallel=progressive, on_ready=on_ready)
+            self.publish(engine_set)
+            return engine_set
+        finally:
+            self._ready.set()  # 실패해도 대기 중인 호출자는 깨움 (엔진별 상태는 status()로 확인)
+            self._reload_lock.release()
+
+    def _publish_partial(self, engine_set: EngineSet):
+        """완성된 엔진만 담은 부분 스냅샷 공개 (아직 없는 엔진은 이전 버전 인스턴스 유지)"""
+        previous = self._current
+        engines = dict(previous.engines)
+        engines.update(engine_set.engines)
+        report = dict(previous.build_report)
+        report.update(engine_set.build_report)
+        self._current = EngineSet(
+            version=engine_set.version,
+            engines=MappingProxyType(engines),
+            build_report=MappingProxyType(report),
+            built_at=engine_set.built_at
+        )
+
+    async def start(self, wait: bool = False) -> Optional[EngineSet]:
+        """
+        앱 시작 시 엔진 로드 (준비된 엔진부터 공개)
+
+        Args:
+            wait: True면 모든 엔진이 준비될 때까지 대기, False면 백그라운드에서 계속 로드
+        """
+        if self.ready:
+            return self._current  # 이미 로드됨 (같은 프로세스에서 앱을 다시 시작한 경우)
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(None, lambda: self.load(progressive=True))
+        if wait:
+            return await future
+        future.add_done_callback(self._log_background_result)
+        return None
+
+    @staticmethod
+    def _log_background_result(future):
+        try:
+            engine_set = future.result()
+            logger.info(f"모든 엔진 초기화 완료 (엔진 스냅샷 v{engine_set.version}, "
+                        f"{engine_set.build_seconds:.2f}초)")
+        except Exception as e:
+            logger.error(f"엔진 초기화 중 오류: {e}")
+
+    @property
+    def ready(self) -> bool:
+        """첫 전체 로드 완료 여부"""
+        return self._ready.is_set()
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """첫 전체 로드가 끝날 때까지 대기 (timeout 초과 시 False)"""
+        return self._ready.wait(timeout)
+
+    async def reload(self) -> EngineSet:
+        """이벤트 루프를 막지 않도록 별도 스레드에서 빌드 후 교체"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, lambda: self.load(reload_modules=True))
+
+    @property
+    def reloading(self) -> bool:
+        """재로딩 진행 여부"""
+        return self._reload_lock.locked()
+
+    def status(self) -> dict:
+        """현재 스냅샷 버전과 엔진별 상태"""
+        current = self._current
+        building = dict(self._building)
+        now = time.time()
+        engines = {}
+        for spec in self.specs:
+            loaded = current.get(spec.key) is not None
+            if spec.key in building:
+                state = "loading"
+            elif loaded:
+                state = "ready"
+            elif spec.key in current.build_report:
+                state = "failed"
+            else:
+                state = "pending"
+            engines[spec.key] = {
+                "name": spec.display_name,
+                "loaded": loaded,
+                "state": state,
+                **current.build_report.get(spec.key, {})
+            }
+            if spec.key in building:
+                engines[spec.key]["loading_seconds"] = round(now - building[spec.key], 2)
+        return {
+            "version": current.version,
+            "built_at": current.built_at,
+            "ready": self.ready,
+            "reloading": self.reloading,
+            "init_workers": self.init_workers,
+            "build_seconds": current.build_seconds,
+            "memory_delta_mb": current.memory_delta_mb,
+            "engines": engines
+        }
+
+
+# 앱 전체가 공유하는 엔진 레지스트리
+engine_registry = EngineRegistry()
@@ -2,12 +2,331 @@
 공통 헬퍼 함수들
 """
 from fastapi import HTTPException
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import asyncio
+import functools
+import hashlib
+import importlib
+import json
 import logging
+import os
+import threading
+import time
+
+from metrics import metrics
+from engine_logging import init_worker_logging
 
 logger = logging.getLogger(__name__)
 
 
-def handle_recommendation_request(
+class RecommendationCache:
+    """
+    추천 결과 LRU 캐시
+    
+    추천 결과는 요청 파라미터와 로드된 데이터만으로 결정되므로
+    정규화된 요청 키로 결과를 재사용하고, 데이터 재로딩 시 전체 무효화
+    """
+    
+    def __init__(self, max_size: int = 512, ttl_seconds: float = 600.0):
+        """
+        Args:
+            max_size: 최대 저장 항목 수 (초과 시 가장 오래 사용되지 않은 항목 제거)
+            ttl_seconds: 항목 유효 시간 (초)
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.generation = 0
+    
+    @staticmethod
+    def make_key(namespace: str, params) -> str:
+        """요청 파라미터를 정규화하여 캐시 키 생성"""
+        if hasattr(params, 'model_dump'):
+            params = params.model_dump(mode='json')
+        canonical = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str, separators=(',', ':'))
+        digest = hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+        return f"{namespace}:{digest}"
+    
+    def get(self, key: str):
+        """캐시 조회 - (적중 여부, 값) 반환"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+    
+    def set(self, key: str, value, generation: int = None):
+        """캐시 저장 (generation이 주어지면 그 사이 무효화된 경우 저장하지 않음)"""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        """전체 무효화 (데이터 재로딩 시 호출)"""
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+    
+    def stats(self) -> dict:
+        """캐시 통계"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0
+            }
+
+
+# 모든 추천 엔드포인트가 공유하는 결과 캐시
+recommendation_cache = RecommendationCache(
+    max_size=int(os.environ.get("RECOMMENDATION_CACHE_SIZE", 512)),
+    ttl_seconds=float(os.environ.get("RECOMMENDATION_CACHE_TTL", 600))
+)
+
+
+# 프로세스 풀 워커마다 보관하는 엔진 인스턴스 ((모듈, 클래스) -> 엔진)
+_worker_engines = {}
+
+
+def _call_in_worker(module_name: str, class_name: str, method_name: str, args, kwargs):
+    """프로세스 풀 워커에서 엔진 메서드 실행 (엔진은 워커별로 한 번만 로드)"""
+    key = (module_name, class_name)
+    engine = _worker_engines.get(key)
+    if engine is None:
+        module = importlib.import_module(module_name)
+        engine = getattr(module, class_name)()
+        _worker_engines[key] = engine
+    return getattr(engine, method_name)(*args, **kwargs)
+
+
+def _parse_engine_list(value: str) -> set:
+    """'암보험 프로필,연금보험' 형태의 환경변수를 집합으로 변환"""
+    return {name.strip() for name in value.split(",") if name.strip()}
+
+
+def _parse_engine_limits(value: str) -> dict:
+    """'종신보험=2,암보험 프로필=4' 형태의 환경변수를 딕셔너리로 변환"""
+    limits = {}
+    for item in value.split(","):
+        name, sep, limit = item.partition("=")
+        if sep and name.strip():
+            limits[name.strip()] = int(limit)
+    return limits
+
+
+class EngineExecutor:
+    """
+    엔진 호출 실행기
+
+    엔드포인트는 async def지만 엔진은 동기 pandas/sklearn 코드이므로
+    이벤트 루프를 막지 않도록 엔진 호출을 스레드 풀(NumPy/sklearn 위주 경로) 또는
+    프로세스 풀(파이썬 루프 위주 경로)에서 실행하고,
+    엔진별 동시 실행 수와 대기열 길이를 제한하여 초과 시 503으로 거절
+    """
+
+    def __init__(self, thread_workers: int = 8, process_workers: int = 0,
+                 process_engines=(), max_concurrency: int = 4, queue_limit: int = 64,
+                 engine_limits: dict = None):
+        """
+        Args:
+            thread_workers: 스레드 풀 크기
+            process_workers: 프로세스 풀 크기 (0이면 프로세스 풀 미사용)
+            process_engines: 프로세스 풀에서 실행할 엔진 이름 목록
+            max_concurrency: 엔진별 기본 동시 실행 수
+            queue_limit: 엔진별 최대 대기 요청 수 (실행 중 포함)
+            engine_limits: 엔진별 동시 실행 수 재정의
+        """
+        self.thread_workers = thread_workers
+        self.process_workers = process_workers
+        self.process_engines = set(process_engines)
+        self.max_concurrency = max_concurrency
+        self.queue_limit = queue_limit
+        self.engine_limits = dict(engine_limits or {})
+        self._thread_pool = None
+        self._process_pool = None
+        self._pool_lock = threading.Lock()
+        self._semaphores = {}
+        self._pending = {}
+        self.rejected = {}
+
+    def _get_thread_pool(self) -> ThreadPoolExecutor:
+        with self._pool_lock:
+            if self._thread_pool is None:
+                self._thread_pool = ThreadPoolExecutor(
+                    max_workers=self.thread_workers, thread_name_prefix="engine"
+                )
+            return self._thread_pool
+
+    def _get_process_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._process_pool is None:
+                self._process_pool = ProcessPoolExecutor(
+                    max_workers=self.process_workers, initializer=init_worker_logging
+                )
+            return self._process_pool
+
+    def uses_process_pool(self, engine_name: str) -> bool:
+        """해당 엔진을 프로세스 풀에서 실행하는지 여부"""
+        return self.process_workers > 0 and engine_name in self.process_engines
+
+    def concurrency_limit(self, engine_name: str) -> int:
+        """엔진별 동시 실행 수"""
+        return self.engine_limits.get(engine_name, self.max_concurrency)
+
+    def _semaphore(self, engine_name: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(engine_name)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.concurrency_limit(engine_name))
+            self._semaphores[engine_name] = semaphore
+        return semaphore
+
+    async def run(self, engine_name: str, engine, method_name: str, *args, **kwargs):
+        """
+        엔진 메서드를 풀에서 실행하고 결과 반환
+
+        Args:
+            engine_name: 엔진 이름 (동시성 제한 단위)
+            engine: 엔진 인스턴스
+            method_name: 호출할 메서드 이름
+            *args, **kwargs: 메서드 인자
+
+        Raises:
+            HTTPException(503): 엔진 대기열이 가득 찬 경우
+        """
+        # 대기열 길이 확인 (이벤트 루프 스레드에서만 변경되므로 잠금 불필요)
+        pending = self._pending.get(engine_name, 0)
+        if pending >= self.queue_limit:
+            self.rejected[engine_name] = self.rejected.get(engine_name, 0) + 1
+            logger.warning(f"{engine_name} 대기열 초과로 요청 거절 (대기 {pending}건)")
+            raise HTTPException(
+                status_code=503,
+                detail=f"{engine_name} 추천 요청이 많아 처리할 수 없습니다. 잠시 후 다시 시도해주세요."
+            )
+
+        self._pending[engine_name] = pending + 1
+        try:
+            async with self._semaphore(engine_name):
+                loop = asyncio.get_running_loop()
+                if self.uses_process_pool(engine_name):
+                    # 엔진 인스턴스 대신 클래스 경로만 전달하고 워커에서 로드한 엔진 사용
+                    call = functools.partial(
+                        _call_in_worker, type(engine).__module__, type(engine).__name__,
+                        method_name, args, kwargs
+                    )
+                    return await loop.run_in_executor(self._get_process_pool(), call)
+                call = functools.partial(getattr(engine, method_name), *args, **kwargs)
+                return await loop.run_in_executor(self._get_thread_pool(), call)
+        finally:
+            self._pending[engine_name] -= 1
+
+    def reset_process_pool(self):
+        """
+        프로세스 풀 재시작 (데이터 재로딩 후 워커의 엔진을 새로 로드하도록)
+        
+        새 요청은 새 풀로 보내고, 이전 풀에 이미 들어간 요청은 취소하지 않고
+        이전 워커에서 끝까지 처리한 뒤 풀이 종료됨 (무중단 재로딩)
+        """
+        with self._pool_lock:
+            pool, self._process_pool = self._process_pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=False)
+
+    def shutdown(self):
+        """모든 풀 종료 (앱 종료 시 호출)"""
+        with self._pool_lock:
+            pools = [self._thread_pool, self._process_pool]
+            self._thread_pool = None
+            self._process_pool = None
+        for pool in pools:
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        # 세마포어는 이벤트 루프에 묶이므로 다음 루프에서 새로 생성
+        self._semaphores.clear()
+
+    def stats(self) -> dict:
+        """실행기 설정 및 엔진별 대기 현황"""
+        engine_names = set(self._pending) | set(self.rejected) | set(self.engine_limits)
+        return {
+            "thread_workers": self.thread_workers,
+            "process_workers": self.process_workers,
+            "queue_limit": self.queue_limit,
+            "engines": {
+                name: {
+                    "pool": "process" if self.uses_process_pool(name) else "thread",
+                    "concurrency_limit": self.concurrency_limit(name),
+                    "pending": self._pending.get(name, 0),
+                    "rejected": self.rejected.get(name, 0)
+                }
+                for name in sorted(engine_names)
+            }
+        }
+
+
+# 모든 추천 엔드포인트가 공유하는 엔진 실행기
+engine_executor = EngineExecutor(
+    thread_workers=int(os.environ.get("ENGINE_THREAD_WORKERS", 8)),
+    process_workers=int(os.environ.get("ENGINE_PROCESS_WORKERS", 0)),
+    process_engines=_parse_engine_list(os.environ.get("ENGINE_PROCESS_ENGINES", "")),
+    max_concurrency=int(os.environ.get("ENGINE_MAX_CONCURRENCY", 4)),
+    queue_limit=int(os.environ.get("ENGINE_QUEUE_LIMIT", 64)),
+    engine_limits=_parse_engine_limits(os.environ.get("ENGINE_CONCURRENCY_LIMITS", ""))
+)
+
+
+async def run_engine_cached(namespace: str, params, engine, method_name: str, *args, **kwargs):
+    """
+    캐시를 먼저 조회하고, 없으면 실행기에서 엔진 메서드를 실행한 뒤 저장
+
+    Args:
+        namespace: 캐시 네임스페이스 겸 동시성 제한 단위 엔진 이름
+        params: 캐시 키로 사용할 요청 파라미터
+        engine: 엔진 인스턴스
+        method_name: 호출할 메서드 이름
+        *args, **kwargs: 메서드 인자
+    """
+    start = time.perf_counter()
+    key = recommendation_cache.make_key(namespace, params)
+    generation = recommendation_cache.generation
+    hit, value = recommendation_cache.get(key)
+    metrics.record_cache(namespace, hit)
+    if hit:
+        metrics.record_request(namespace, time.perf_counter() - start)
+        return value
+    try:
+        value = await engine_executor.run(namespace, engine, method_name, *args, **kwargs)
+    except Exception:
+        metrics.record_request(namespace, time.perf_counter() - start, error=True)
+        raise
+    metrics.record_request(namespace, time.perf_counter() - start)
+    # 계산 도중 재로딩되었다면 이전 버전 결과이므로 저장하지 않음
+    recommendation_cache.set(key, value, generation=generation)
+    return value
+
+
+async def handle_recommendation_request(
     engine,
     request,
     engine_name: str,
@@ -38,8 +357,10 @@ def handle_recommendation_request(
                 detail=f"{engine_name} 추천 엔진이 초기화되지 않았습니다."
             )
         
-        # 추천 실행
-        recommendations = engine.get_recommendations(request)
+        # 추천 실행 (동일 요청은 캐시 재사용)
+        recommendations = await run_engine_cached(
+            engine_name, request, engine, "get_recommendations", request
+        )
         
         # 결과 변환 (필요시)
         if transform_func:
@@ -66,7 +387,7 @@ def handle_recommendation_request(
         )
 
 
-def handle_simple_dict_request(
+async def handle_simple_dict_request(
     engine,
     request_dict: dict,
     engine_name: str
@@ -99,12 +420,10 @@ def handle_simple_dict_request(
         purpose = request_dict.get("purpose", "단기저축")
         top_n = request_dict.get("top_n", 5)
         
-        # 추천 실행
-        recommendations = engine.get_recommendations(
-            age=age,
-            monthly_budget=monthly_budget,
-            purpose=purpose,
-            top_n=top_n
+        # 추천 실행 (동일 요청은 캐시 재사용)
+        params = {"age": age, "monthly_budget": monthly_budget, "purpose": purpose, "top_n": top_n}
+        recommendations = await run_engine_cached(
+            engine_name, params, engine, "get_recommendations", **params
         )
         
         logger.info(f"{engine_name} 추천 완료: {len(recommendations)}개")
@@ -0,0 +1,68 @@
+"""
+구간 점 질의(stabbing query) 인덱스
+
+가입 나이처럼 상품마다 [하한, 상한] 구간이 있을 때 "이 나이를 포함하는 상품"을
+전체 행 비교 없이 O(log n + k)에 조회
+
+모든 구간 경계를 정렬하면 수직선이 경계점과 경계 사이 열린 구간(기본 구간)으로 나뉘고,
+같은 기본 구간 안의 점은 포함하는 상품 집합이 같으므로 기본 구간별 결과를 미리 만들어 둠
+조회는 경계 배열 이분 탐색 한 번과 결과 슬라이스 반환뿐
+
+기본 구간 수가 경계 수에 비례하므로 나이처럼 경계 값 종류가 적은 도메인에 적합
+"""
+import numpy as np
+from typing import Optional
+
+
+class IntervalIndex:
+    """닫힌 구간 [lower, upper] 모음의 점 질의 인덱스 (읽기 전용)"""
+
+    def __init__(self, lower, upper, ids: Optional[np.ndarray] = None):
+        """
+        Args:
+            lower: 구간 하한 배열 (제한 없음은 -np.inf)
+            upper: 구간 상한 배열 (제한 없음은 np.inf)
+            ids: 구간별 반환 값 (기본: 위치). 결과는 위치 순서로 반환
+        """
+        lower = np.asarray(lower, dtype=float)
+        upper = np.asarray(upper, dtype=float)
+        ids = np.arange(len(lower)) if ids is None else np.asarray(ids)
+        self.size = len(lower)
+
+        # 결측 경계나 하한 > 상한인 구간은 어떤 점도 포함하지 않음
+        valid = ~(np.isnan(lower) | np.isnan(upper)) & (lower <= upper)
+        self._bounds = np.unique(np.concatenate([lower[valid], upper[valid]]))
+
+        # 기본 구간 2i: bounds[i-1] < x < bounds[i], 2i+1: x == bounds[i]
+        prev_bounds = np.concatenate([[-np.inf], self._bounds])
+        next_bounds = np.concatenate([self._bounds, [np.inf]])
+        chunks, offsets = [], [0]
+        for i in range(len(self._bounds) + 1):
+            gap = valid & (lower <= prev_bounds[i]) & (upper >= next_bounds[i])
+            chunks.append(ids[gap])
+            offsets.append(offsets[-1] + int(gap.sum()))
+            if i < len(self._bounds):
+                point = valid & (lower <= self._bounds[i]) & (upper >= self._bounds[i])
+                chunks.append(ids[point])
+                offsets.append(offsets[-1] + int(point.sum()))
+
+        self._ids = np.concatenate(chunks) if chunks else ids[:0]
+        self._offsets = np.asarray(offsets)
+        self._ids.setflags(write=False)
+
+    def _slot(self, x: float) -> int:
+        i = int(np.searchsorted(self._bounds, x, side='left'))
+        if i < len(self._bounds) and self._bounds[i] == x:
+            return 2 * i + 1
+        return 2 * i
+
+    def stab(self, x: float) -> np.ndarray:
+        """x를 포함하는 구간의 ids (위치 순서, 읽기 전용 배열)"""
+        if x is None or np.isnan(x):
+            return self._ids[:0]
+        slot = self._slot(float(x))
+        return self._ids[self._offsets[slot]:self._offsets[slot + 1]]
+
+    def count(self, x: float) -> int:
+        """x를 포함하는 구간 수"""
+        return len(self.stab(x))
@@ -8,20 +8,48 @@ from pathlib import Path
 import os
 import sys
 import json
+import joblib
 import pandas as pd
 import numpy as np
+import sklearn
 from sklearn.preprocessing import LabelEncoder, StandardScaler
 from sklearn.neighbors import NearestNeighbors
 from difflib import get_close_matches
 from typing import List, Dict, Any
 
+from product_store import ProductStore
+from metrics import metrics
+from engine_logging import EngineLogger, sampled_request
+from top_k import top_k_indices
+from snapshot import SNAPSHOT_DIR, file_hash
+
+logger = EngineLogger(__name__)
+
+# 학습된 인코더/스케일러/KNN 모델 저장 경로
+MODEL_ARTIFACT_PATH = os.path.join(SNAPSHOT_DIR, "life_knn.joblib")
+
+# 일괄 추천 시 한 번에 행렬 연산할 프로필 수
+BATCH_CHUNK_SIZE = 512
+
 
 class LifeInsuranceEngine:
     """종신보험 KNN 추천 엔진 클래스"""
     
+    # 모델 아티팩트 버전 (학습 로직 변경 시 증가)
+    MODEL_VERSION = 1
+    # 보험료 조건을 만족하는 상품이 이 수 이하이면 KNN 인덱스 대신 직접 거리 계산
+    BRUTE_FORCE_MAX = 256
+    # 아티팩트에 저장하는 학습 결과 속성
+    MODEL_ATTRIBUTES = (
+        "insurance_df", "job", "jobrisk", "product", "gender",
+        "df_f", "scaler_f", "X_f_scaled", "knn_f",
+        "df_m", "scaler_m", "X_m_scaled", "knn_m",
+        "job2risk_lookup"
+    )
+    
     def __init__(self, csv_path: str = None):
         """
-        초기화 및 KNN 모델 학습
+        초기화 및 KNN 모델 로드 (저장된 모델이 없거나 오래된 경우 학습)
         
         Args:
             csv_path: 종신보험 데이터 CSV 파일 경로
@@ -47,6 +75,17 @@ class LifeInsuranceEngine:
         if not csv_path or not Path(csv_path).exists():
             raise FileNotFoundError("종신보험 데이터 파일을 찾을 수 없습니다.")
         
+        self.csv_path = csv_path
+        
+        # 저장된 모델이 현재 CSV와 일치하면 재사용, 아니면 새로 학습 후 저장
+        if not self._load_model_artifact():
+            self._fit(csv_path)
+            self._save_model_artifact()
+        
+        self._build_stores()
+    
+    def _fit(self, csv_path: str):
+        """CSV 로드, 인코딩 및 KNN 모델 학습"""
         # CSV 불러오기
         self.insurance_df = pd.read_csv(csv_path)
         
@@ -67,6 +106,83 @@ class LifeInsuranceEngine:
         # 직업-위험도 매핑
         self.job2risk_lookup = self._build_job_to_risk_lookup()
     
+    def _model_artifact_meta(self) -> Dict[str, Any]:
+        """모델 아티팩트 유효성 판단용 메타데이터"""
+        return {
+            "model_version": self.MODEL_VERSION,
+            "sklearn_version": sklearn.__version__,
+            "pandas_version": pd.__version__,
+            "data_hash": file_hash(self.csv_path)
+        }
+    
+    def _load_model_artifact(self) -> bool:
+        """저장된 모델 로드 (버전/데이터 해시가 다르면 False)"""
+        if not os.path.exists(MODEL_ARTIFACT_PATH):
+            return False
+        try:
+            artifact = joblib.load(MODEL_ARTIFACT_PATH)
+            if artifact.get("meta") != self._model_artifact_meta():
+                logger.info("종신보험 모델 아티팩트가 오래되어 다시 학습합니다.")
+                return False
+            for name in self.MODEL_ATTRIBUTES:
+                setattr(self, name, artifact["state"][name])
+            logger.info(f"종신보험 모델 아티팩트 로드 완료: {MODEL_ARTIFACT_PATH}")
+            return True
+        except Exception as e:
+            logger.warning(f"종신보험 모델 아티팩트 로드 실패, 다시 학습합니다: {e}")
+            return False
+    
+    def _save_model_artifact(self):
+        """학습된 모델 저장 (실패해도 서비스에는 영향 없음)"""
+        try:
+            os.makedirs(os.path.dirname(MODEL_ARTIFACT_PATH), exist_ok=True)
+            artifact = {
+                "meta": self._model_artifact_meta(),
+                "state": {name: getattr(self, name) for name in self.MODEL_ATTRIBUTES}
+            }
+            # 동시에 저장하는 다른 프로세스와 겹치지 않도록 프로세스별 임시 파일에 쓴 뒤 교체
+            tmp_path = f"{MODEL_ARTIFACT_PATH}.{os.getpid()}.tmp"
+            try:
+                joblib.dump(artifact, tmp_path)
+                os.replace(tmp_path, MODEL_ARTIFACT_PATH)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            logger.info(f"종신보험 모델 아티팩트 저장 완료: {MODEL_ARTIFACT_PATH}")
+        except Exception as e:
+            logger.warning(f"종신보험 모델 아티팩트 저장 실패: {e}")
+    
+    def _build_stores(self):
+        """성별 풀별 컬럼형 저장소, 보험료 정렬 축 및 쿼리용 구성요소 생성"""
+        self.store_f = ProductStore(self.df_f, numeric_columns=["여자(보험료)", "지급금액"])
+        self.store_m = ProductStore(self.df_m, numeric_columns=["남자(보험료)", "지급금액"])
+        
+        # 보험료 오름차순 정렬 축 (보험료 상한 필터를 이분 탐색으로 처리)
+        self.premium_order_f = np.argsort(self.store_f.column("여자(보험료)"), kind="stable")
+        self.premium_sorted_f = self.store_f.column("여자(보험료)")[self.premium_order_f]
+        self.premium_order_m = np.argsort(self.store_m.column("남자(보험료)"), kind="stable")
+        self.premium_sorted_m = self.store_m.column("남자(보험료)")[self.premium_order_m]
+        
+        # 결과 출력용 원본 상품명 (인코딩 복원은 로드 시 한 번만)
+        self.product_names_f = self._restore_product_names(self.df_f["상품명"]).to_numpy()
+        self.product_names_m = self._restore_product_names(self.df_m["상품명"]).to_numpy()
+        
+        # 성별 코드별 상품 풀 구성요소 (0: 여자, 1: 남자)
+        self._pools = {}
+        for g, premium_col, store, scaler, X, knn, names, order, sorted_premiums in (
+            (0, "여자(보험료)", self.store_f, self.scaler_f, self.X_f_scaled, self.knn_f,
+             self.product_names_f, self.premium_order_f, self.premium_sorted_f),
+            (1, "남자(보험료)", self.store_m, self.scaler_m, self.X_m_scaled, self.knn_m,
+             self.product_names_m, self.premium_order_m, self.premium_sorted_m),
+        ):
+            x_sq = np.einsum("ij,ij->i", X, X)
+            self._pools[g] = {
+                "premium_col": premium_col, "store": store, "scaler": scaler,
+                "X": X, "knn": knn, "product_names": names,
+                "premium_order": order, "premium_sorted": sorted_premiums,
+                "x_sq": x_sq, "x_sq_max": float(x_sq.max()) if len(x_sq) else 0.0
+            }
+    
     def _train_knn_models(self):
         """성별별 KNN 모델 학습"""
         # 여자 데이터셋
@@ -134,6 +250,39 @@ class LifeInsuranceEngine:
         except Exception:
             return series_like
     
+    def _nearest_eligible(self, knn, X_pool_scaled, q_scaled, premiums, premium: float,
+                          eligible: np.ndarray, k: int):
+        """
+        보험료 상한을 만족하는 상품 중 가까운 후보와 거리 반환
+        
+        조건을 만족하는 상품이 적으면 해당 상품만 직접 계산하고,
+        많으면 학습된 KNN 인덱스를 조회 범위를 넓혀 가며 사용
+        (k번째 거리와 같은 동점 후보까지 모두 포함)
+        """
+        n_pool = len(X_pool_scaled)
+        n_eligible = len(eligible)
+        
+        # 인덱스 조회 시 예상 탐색 수(k * n_pool / n_eligible)가 직접 계산보다 크면 직접 계산
+        if n_eligible <= self.BRUTE_FORCE_MAX or n_eligible * n_eligible <= 4 * k * n_pool:
+            return eligible, np.linalg.norm(X_pool_scaled[eligible] - q_scaled, axis=1)
+        
+        n_query = min(n_pool, max(4 * k, int(np.ceil(2 * k * n_pool / n_eligible))))
+        while True:
+            tree_dists, ind = knn.kneighbors(q_scaled, n_neighbors=n_query)
+            ind = ind[0]
+            cand = ind[premiums[ind] <= premium]
+            dists = np.linalg.norm(X_pool_scaled[cand] - q_scaled, axis=1)
+            if n_query == n_pool:
+                return cand, dists
+            if len(cand) >= k:
+                kth_dist = np.partition(dists, k - 1)[k - 1]
+                # 조회되지 않은 상품은 모두 k번째 거리보다 멀어야 정확한 결과
+                if tree_dists[0, -1] > kth_dist * (1 + 1e-9) + 1e-12:
+                    return cand, dists
+            n_query = min(n_pool, n_query * 2)
+    
+    @metrics.tracked("life")
+    @sampled_request
     def recommend(self, gender_input: str, premium: int, coverage: int, age: int, 
                   job_text: str, k: int = 5, sort_by: str = "distance") -> List[Dict[str, Any]]:
         """
@@ -151,61 +300,184 @@ class LifeInsuranceEngine:
         Returns:
             추천 상품 리스트
         """
-        g = self._coerce_gender(gender_input)
-        j_code = self._to_job_code(job_text)
-        r_code = self._infer_risk_from_job(job_text)
-        if r_code is None:
-            r_code = int(self.insurance_df["직업 위험도"].mode().iloc[0])
+        g, base_vec = self._build_query(gender_input, premium, coverage, age, job_text)
+        pool = self._pools[g]
+        q_scaled = pool["scaler"].transform(base_vec)
         
-        base_vec = np.array([[float(premium), float(coverage), float(age), float(j_code), float(r_code)]], dtype=float)
+        selected, dists = self._select(pool, q_scaled[0], premium, coverage, k, sort_by)
+        results = self._format_results(pool, selected, dists)
+        metrics.mark("serialize")
+        return results
+    
+    def recommend_many(self, profiles: List[Dict[str, Any]], chunk_size: int = BATCH_CHUNK_SIZE):
+        """
+        여러 사용자 프로필 일괄 추천 (대량 캠페인용)
+        
+        청크 단위로 성별별 StandardScaler.transform을 한 번만 호출하고,
+        보험료 상한을 반영한 거리 행렬을 행렬 곱으로 계산
+        결과는 입력 순서대로 프로필마다 yield
+        
+        Args:
+            profiles: recommend()와 같은 키를 가진 딕셔너리 리스트
+                      (gender_input, premium, coverage, age, job_text, k, sort_by)
+            chunk_size: 한 번에 행렬 연산할 프로필 수
+        
+        Yields:
+            (입력 인덱스, 추천 상품 리스트, 오류 메시지 또는 None)
+        """
+        job_cache = {}
+        for start in range(0, len(profiles), chunk_size):
+            yield from self.recommend_chunk(profiles[start:start + chunk_size], start, job_cache)
+    
+    def recommend_chunk(self, chunk: List[Dict[str, Any]], start: int = 0, job_cache: dict = None):
+        """
+        프로필 한 청크 일괄 추천 (API에서 청크마다 엔진 실행기를 거쳐 호출)
+        
+        Args:
+            chunk: recommend_many()와 같은 형식의 프로필 리스트
+            start: 첫 프로필의 전체 입력 내 인덱스
+            job_cache: 직업 텍스트 -> (직업 코드, 위험도) 재사용 캐시
+        
+        Returns:
+            [(입력 인덱스, 추천 상품 리스트, 오류 메시지 또는 None), ...]
+        """
+        if job_cache is None:
+            job_cache = {}
+        results = [None] * len(chunk)
+        groups = {0: [], 1: []}
         
-        if g == 0:
-            premium_col = "여자(보험료)"
-            pool_df = self.df_f
-            q_scaled = self.scaler_f.transform(base_vec)
-            X_pool_scaled = self.X_f_scaled
+        # 프로필별 쿼리 벡터 생성 (직업 변환은 배치 내에서 재사용)
+        for i, profile in enumerate(chunk):
+            try:
+                g, base_vec = self._build_query(
+                    profile["gender_input"], profile["premium"], profile["coverage"],
+                    profile["age"], profile["job_text"], job_cache
+                )
+                groups[g].append((i, base_vec[0]))
+            except Exception as e:
+                results[i] = ([], str(e))
+        
+        for g, members in groups.items():
+            if not members:
+                continue
+            pool = self._pools[g]
+            rows = [i for i, _ in members]
+            Q = pool["scaler"].transform(np.vstack([vec for _, vec in members]))
+            X = pool["X"]
+            
+            # 제곱 거리 행렬: |q|^2 + |x|^2 - 2 q·x (BLAS 행렬 곱)
+            q_sq = np.einsum("ij,ij->i", Q, Q)
+            sq_dists = q_sq[:, None] + pool["x_sq"][None, :] - 2.0 * (Q @ X.T)
+            np.maximum(sq_dists, 0.0, out=sq_dists)
+            
+            for row_pos, i in enumerate(rows):
+                profile = chunk[i]
+                try:
+                    selected, dists = self._select(
+                        pool, Q[row_pos], profile["premium"], profile["coverage"],
+                        profile.get("k", 5), profile.get("sort_by", "distance"),
+                        sq_dist_row=sq_dists[row_pos], q_sq=q_sq[row_pos]
+                    )
+                    results[i] = (self._format_results(pool, selected, dists), None)
+                except Exception as e:
+                    results[i] = ([], str(e))
+        
+        return [(start + i, recommendations, error) for i, (recommendations, error) in enumerate(results)]
+    
+    def _build_query(self, gender_input, premium, coverage, age, job_text, job_cache=None):
+        """성별 코드와 스케일링 전 쿼리 벡터 생성"""
+        g = self._coerce_gender(gender_input)
+        if job_cache is not None and job_text in job_cache:
+            j_code, r_code = job_cache[job_text]
         else:
-            premium_col = "남자(보험료)"
-            pool_df = self.df_m
-            q_scaled = self.scaler_m.transform(base_vec)
-            X_pool_scaled = self.X_m_scaled
+            j_code = self._to_job_code(job_text)
+            r_code = self._infer_risk_from_job(job_text)
+            if r_code is None:
+                r_code = int(self.insurance_df["직업 위험도"].mode().iloc[0])
+            if job_cache is not None:
+                job_cache[job_text] = (j_code, r_code)
         
-        mask = pool_df[premium_col] <= float(premium)
-        idxs = np.where(mask.values)[0]
+        base_vec = np.array([[float(premium), float(coverage), float(age), float(j_code), float(r_code)]], dtype=float)
+        return g, base_vec
+    
+    def _select(self, pool, q_scaled, premium, coverage, k, sort_by,
+                sq_dist_row=None, q_sq=None):
+        """
+        보험료 상한 이하 상품 중 정렬 기준 상위 k개 선택
         
-        if len(idxs) == 0:
-            return []
+        sq_dist_row가 주어지면(배치 경로) 미리 계산된 제곱 거리 행으로 후보를 좁힘
         
-        diffs = X_pool_scaled[idxs] - q_scaled
-        dists = np.linalg.norm(diffs, axis=1)
+        Returns:
+            (선택된 풀 내 위치 배열, 해당 상품의 거리 배열)
+        """
+        premium_sorted = pool["premium_sorted"]
+        premium_order = pool["premium_order"]
+        X_pool_scaled = pool["X"]
+        store = pool["store"]
         
-        rec_rows = pool_df.iloc[idxs].copy()
-        rec_rows["상품명"] = self._restore_product_names(rec_rows["상품명"])
-        rec_rows["_distance"] = dists
+        # 보험료 정렬 축에서 희망 보험료 이하 상품 수를 이분 탐색
+        n_eligible = int(np.searchsorted(premium_sorted, float(premium), side="right"))
+        k = min(k, n_eligible)
+        metrics.mark("filter")
+        if k <= 0:
+            return np.empty(0, dtype=np.intp), np.empty(0)
         
+        premiums = store.column(pool["premium_col"])
         if sort_by == "premium":
-            rec_rows["_sortkey"] = (rec_rows[premium_col] - premium).abs()
+            # 희망 보험료에 가장 가까운 = 상한 이하에서 가장 비싼 상품 (정렬 축의 끝부분)
+            kth_premium = premium_sorted[n_eligible - k]
+            start = int(np.searchsorted(premium_sorted, kth_premium, side="left"))
+            cand = premium_order[start:n_eligible]
+            sort_key = np.abs(premiums[cand] - premium)
         elif sort_by == "coverage":
-            rec_rows["_sortkey"] = (rec_rows["지급금액"] - coverage).abs()
+            cand = premium_order[:n_eligible]
+            sort_key = np.abs(store.column("지급금액", cand) - coverage)
+        elif sq_dist_row is not None:  # distance (배치)
+            eligible = premium_order[:n_eligible]
+            row = sq_dist_row[eligible]
+            if len(eligible) > k:
+                # 행렬 곱 반올림 오차보다 넉넉한 여유를 두고 후보를 좁힌 뒤 정확한 거리로 재정렬
+                kth = np.partition(row, k - 1)[k - 1]
+                tol = 1e-9 * (q_sq + pool["x_sq_max"]) + 1e-12
+                eligible = eligible[row <= kth + tol]
+            cand = eligible
+            sort_key = np.linalg.norm(X_pool_scaled[cand] - q_scaled, axis=1)
         else:  # distance
-            rec_rows["_sortkey"] = rec_rows["_distance"]
+            cand, sort_key = self._nearest_eligible(
+                pool["knn"], X_pool_scaled, q_scaled[None, :], premiums, float(premium), premium_order[:n_eligible], k
+            )
+        
+        metrics.mark("score")
         
-        rec_rows = rec_rows.sort_values(by="_sortkey", ascending=True).head(k)
+        # 동점은 원래 순서 유지
+        selected = cand[top_k_indices(sort_key, k, tiebreak=cand)]
+        dists = np.linalg.norm(X_pool_scaled[selected] - q_scaled, axis=1)
+        metrics.mark("sort")
+        return selected, dists
+    
+    def _format_results(self, pool, selected, dists) -> List[Dict[str, Any]]:
+        """선택된 상품을 응답용 딕셔너리 리스트로 변환"""
+        pool_df = pool["store"].df
+        premium_values = pool_df[pool["premium_col"]].to_numpy()[selected]
+        coverage_values = pool_df["지급금액"].to_numpy()[selected]
+        age_values = pool_df["나이"].to_numpy()[selected]
+        product_names = pool["product_names"][selected]
+        job_values = pool_df["직업(원문)"].to_numpy()[selected] if "직업(원문)" in pool_df.columns else None
+        risk_values = pool_df["직업 위험도(원문)"].to_numpy()[selected] if "직업 위험도(원문)" in pool_df.columns else None
         
-        # 결과를 딕셔너리 리스트로 변환
         results = []
-        for _, row in rec_rows.iterrows():
+        for i in range(len(selected)):
             item = {
-                "product": str(row["상품명"]),
-                "premium": int(row[premium_col]),
-                "coverage": int(row["지급금액"]),
-                "age": int(row["나이"]),
-                "distance": float(row["_distance"])
+                "product": str(product_names[i]),
+                "premium": int(premium_values[i]),
+                "coverage": int(coverage_values[i]),
+                "age": int(age_values[i]),
+                "distance": float(dists[i])
             }
-            if "직업(원문)" in row:
-                item["job"] = str(row["직업(원문)"])
-            if "직업 위험도(원문)" in row:
-                item["risk"] = str(row["직업 위험도(원문)"])
+            if job_values is not None:
+                item["job"] = str(job_values[i])
+            if risk_values is not None:
+                item["risk"] = str(risk_values[i])
             results.append(item)
         
         return results
@@ -1,9 +1,9 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from typing import List
+import json
 import logging
-import importlib
-import sys
 
 from models import (
     RecommendationRequest, 
@@ -14,17 +14,25 @@ from models import (
     SavingsRecommendationRequest,
     SavingsRecommendationResponse,
     LifeInsuranceRequest,
-    LifeInsuranceResponse
+    LifeInsuranceResponse,
+    LifeInsuranceBatchRequest
 )
 from helpers import (
     handle_recommendation_request,
     handle_simple_dict_request,
     handle_analytics_request,
-    convert_to_product_recommendation
+    convert_to_product_recommendation,
+    recommendation_cache,
+    engine_executor,
+    run_engine_cached
 )
+from engine_registry import engine_registry, ENGINE_STARTUP_WAIT
+from life_engine import BATCH_CHUNK_SIZE
+from metrics import metrics
+from engine_logging import setup_logging, shutdown_logging
 
-# 로깅 설정
-logging.basicConfig(level=logging.INFO)
+# 로깅 설정 (큐 기반 비동기 출력, LOG_LEVEL / ENGINE_LOG_LEVEL / ENGINE_LOG_SAMPLE_RATE)
+setup_logging()
 logger = logging.getLogger(__name__)
 
 # FastAPI 앱 생성
@@ -45,73 +53,30 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 전역 변수
-savings_engine = None
-cancer_engine = None
-simple_cancer_engine = None
-life_engine = None
-accident_engine = None
-
 
 @app.on_event("startup")
 async def startup_event():
-    """앱 시작 시 모든 엔진 초기화"""
-    global savings_engine, simple_cancer_engine, cancer_engine, life_engine, accident_engine
+    """
+    앱 시작 시 모든 엔진 초기화
     
+    엔진은 스레드 풀에서 동시에 생성되고 준비된 엔진부터 바로 공개됨
+    기본은 백그라운드 로드로, 아직 준비되지 않은 엔진의 엔드포인트는 503을 반환
+    (ENGINE_STARTUP_WAIT=1이면 모든 엔진이 준비된 뒤 서버 시작)
+    """
     try:
         logger.info("=" * 50)
         logger.info("보험 추천 API 서버 시작 중...")
         logger.info("=" * 50)
         
-        # 연금 보험 엔진
-        try:
-            from pension_engine import SavingsRecommendationEngine
-            savings_engine = SavingsRecommendationEngine()
-            logger.info("✓ 연금보험 추천 엔진 초기화 완료")
-        except Exception as e:
-            logger.warning(f"✗ 연금보험 추천 엔진 초기화 실패: {e}")
-            savings_engine = None
-        
-        # 암보험 엔진
-        try:
-            from cancer_engine import PersonalizedCancerEngine
-            cancer_engine = PersonalizedCancerEngine()
-            simple_cancer_engine = PersonalizedCancerEngine()
-            logger.info("✓ 암보험 추천 엔진 초기화 완료")
-        except Exception as e:
-            logger.warning(f"✗ 암보험 추천 엔진 초기화 실패: {e}")
-            cancer_engine = None
-            simple_cancer_engine = None
-        
-        # 저축성보험 엔진
-        try:
-            from savings_engine import SavingsInsuranceEngine
-            savings_engine = SavingsInsuranceEngine()
-            logger.info("✓ 저축성보험 추천 엔진 초기화 완료")
-        except Exception as e:
-            logger.warning(f"✗ 저축성보험 추천 엔진 초기화 실패: {e}")
-            savings_engine = None
-        
-        # 종신보험 KNN 엔진
-        try:
-            from life_engine import LifeInsuranceEngine
-            life_engine = LifeInsuranceEngine()
-            logger.info("✓ 종신보험 KNN 추천 엔진 초기화 완료")
-        except Exception as e:
-            logger.warning(f"✗ 종신보험 KNN 추천 엔진 초기화 실패: {e}")
-            life_engine = None
-        
-        # 상해보험 엔진
-        try:
-            from accident_engine import AccidentInsuranceEngine
-            accident_engine = AccidentInsuranceEngine()
-            logger.info("✓ 상해보험 추천 엔진 초기화 완료")
-        except Exception as e:
-            logger.warning(f"✗ 상해보험 추천 엔진 초기화 실패: {e}")
-            accident_engine = None
+        # 엔진별 초기화 실패는 해당 엔진만 None으로 두고 계속 진행
+        engine_set = await engine_registry.start(wait=ENGINE_STARTUP_WAIT)
         
         logger.info("=" * 50)
-        logger.info("모든 엔진 초기화 완료! 서버 준비됨")
+        if engine_set is not None:
+            logger.info(f"모든 엔진 초기화 완료! 서버 준비됨 (엔진 스냅샷 v{engine_set.version}, "
+                        f"{engine_set.build_seconds:.2f}초)")
+        else:
+            logger.info("서버 준비됨 - 엔진은 백그라운드에서 초기화 중 (GET /admin/engines로 확인)")
         logger.info("=" * 50)
         
     except Exception as e:
@@ -119,17 +84,35 @@ async def startup_event():
         raise e
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """앱 종료 시 엔진 실행기 및 로그 리스너 정리"""
+    engine_executor.shutdown()
+    shutdown_logging()
+
+
 # ============================================================
 # 헬스체크 엔드포인트
 # ============================================================
 
+def _cancer_data_loaded() -> bool:
+    cancer_engine = engine_registry.get("cancer")
+    return cancer_engine is not None and cancer_engine.df is not None
+
+
+def _engine_states() -> dict:
+    return {key: info["state"] for key, info in engine_registry.status()["engines"].items()}
+
+
 @app.get("/", response_model=HealthCheckResponse)
 async def root():
     """루트 엔드포인트 - 서버 상태 확인"""
     return HealthCheckResponse(
         status="healthy",
         message="보험 상품 추천 API가 정상적으로 실행 중입니다",
-        data_loaded=cancer_engine is not None and cancer_engine.df is not None
+        data_loaded=_cancer_data_loaded(),
+        ready=engine_registry.ready,
+        engines=_engine_states()
     )
 
 
@@ -139,7 +122,9 @@ async def health_check():
     return HealthCheckResponse(
         status="healthy",
         message="API가 정상적으로 작동 중입니다",
-        data_loaded=cancer_engine is not None and cancer_engine.df is not None
+        data_loaded=_cancer_data_loaded(),
+        ready=engine_registry.ready,
+        engines=_engine_states()
     )
 
 
@@ -150,8 +135,8 @@ async def health_check():
 @app.post("/recommend", response_model=RecommendationResponse)
 async def recommend_products(request: RecommendationRequest):
     """암보험 상품 추천 (기본)"""
-    return handle_recommendation_request(
-        simple_cancer_engine,
+    return await handle_recommendation_request(
+        engine_registry.get("cancer"),
         request,
         "암보험",
         RecommendationResponse
@@ -166,10 +151,13 @@ async def get_user_profile_recommendations(request: UserProfileRecommendationReq
     try:
         logger.info(f"사용자 프로필 기반 추천 요청: age={request.age}, sex={request.sex}")
         
+        cancer_engine = engine_registry.get("cancer")
         if cancer_engine is None:
             raise HTTPException(status_code=503, detail="암보험 추천 엔진이 초기화되지 않았습니다.")
         
-        recommendations = cancer_engine.get_recommendations(request)
+        recommendations = await run_engine_cached(
+            "암보험 프로필", request, cancer_engine, "get_recommendations", request
+        )
         
         # ProductRecommendation 형태로 변환
         product_recommendations = convert_to_product_recommendation(
@@ -198,6 +186,7 @@ async def get_user_profile_recommendations(request: UserProfileRecommendationReq
 async def get_analytics_summary():
     """암보험 분석 요약"""
     try:
+        cancer_engine = engine_registry.get("cancer")
         if cancer_engine is None or cancer_engine.df is None:
             return {
                 "total_products": 0,
@@ -223,7 +212,8 @@ async def get_analytics_summary():
 async def get_sample_products():
     """샘플 상품 조회 (상위 5개)"""
     try:
-        if simple_cancer_engine is None:
+        cancer_engine = engine_registry.get("cancer")
+        if cancer_engine is None:
             raise HTTPException(status_code=503, detail="암보험 추천 엔진이 초기화되지 않았습니다.")
         
         request = RecommendationRequest(
@@ -236,8 +226,12 @@ async def get_sample_products():
             weights=(30.0, 50.0, 20.0),
             top_n=5
         )
-        recommendations = simple_cancer_engine.get_recommendations(request)
+        recommendations = await engine_executor.run(
+            "암보험", cancer_engine, "get_recommendations", request
+        )
         return recommendations
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"샘플 상품 조회 중 오류: {str(e)}")
         raise HTTPException(status_code=500, detail=f"샘플 상품 조회 중 오류가 발생했습니다: {str(e)}")
@@ -253,15 +247,21 @@ async def get_savings_recommendations(request: SavingsRecommendationRequest):
     try:
         logger.info(f"연금보험 추천 요청: 나이={request.age}, 예산={request.monthly_budget}, 목적={request.purpose}")
         
+        # 기존 엔진 로딩 순서상 이 엔드포인트는 저축성보험 엔진으로 처리되어 왔고
+        # Spring 클라이언트(SavingsInsuranceService)도 그 결과를 기대하므로 그대로 유지
+        savings_engine = engine_registry.get("savings")
         if savings_engine is None:
             raise HTTPException(status_code=503, detail="연금보험 추천 엔진이 초기화되지 않았습니다.")
         
-        # 연금 보험 추천 (개별 파라미터 전달)
-        recommendations = savings_engine.get_recommendations(
-            age=request.age,
-            monthly_budget=request.monthly_budget,
-            purpose=request.purpose.value,
-            top_n=request.top_n
+        # 연금 보험 추천 (개별 파라미터 전달, 동일 요청은 캐시 재사용)
+        params = {
+            "age": request.age,
+            "monthly_budget": request.monthly_budget,
+            "purpose": request.purpose.value,
+            "top_n": request.top_n
+        }
+        recommendations = await run_engine_cached(
+            "연금보험", params, savings_engine, "get_recommendations", **params
         )
         
         logger.info(f"연금보험 추천 완료: {len(recommendations)}개")
@@ -284,7 +284,7 @@ async def get_savings_recommendations(request: SavingsRecommendationRequest):
 @app.get("/savings/analytics")
 async def get_savings_analytics():
     """연금 보험 분석 요약"""
-    return handle_analytics_request(savings_engine, "연금보험")
+    return handle_analytics_request(engine_registry.get("savings"), "연금보험")
 
 
 # ============================================================
@@ -302,14 +302,13 @@ async def get_accident_recommendations(request: dict):
         
         logger.info(f"상해보험 추천 요청: 나이={age}, 성별={sex}, 상품수={top_n}")
         
+        accident_engine = engine_registry.get("accident")
         if accident_engine is None:
             raise HTTPException(status_code=503, detail="상해보험 추천 엔진이 초기화되지 않았습니다.")
         
-        recommendations = accident_engine.get_recommendations(
-            age=age,
-            sex=sex,
-            top_n=top_n,
-            sort_by=sort_by
+        params = {"age": age, "sex": sex, "top_n": top_n, "sort_by": sort_by}
+        recommendations = await run_engine_cached(
+            "상해보험", params, accident_engine, "get_recommendations", **params
         )
         
         return {
@@ -333,13 +332,13 @@ async def get_accident_recommendations(request: dict):
 @app.post("/recommend/savings-insurance")
 async def get_savings_insurance_recommendations(request: dict):
     """저축성보험 추천"""
-    return handle_simple_dict_request(savings_engine, request, "저축성보험")
+    return await handle_simple_dict_request(engine_registry.get("savings"), request, "저축성보험")
 
 
 @app.get("/savings-insurance/analytics")
 async def get_savings_insurance_analytics():
     """저축성보험 분석 요약"""
-    return handle_analytics_request(savings_engine, "저축성보험")
+    return handle_analytics_request(engine_registry.get("savings"), "저축성보험")
 
 
 # ============================================================
@@ -350,12 +349,17 @@ async def get_savings_insurance_analytics():
 async def recommend_life_insurance(request: LifeInsuranceRequest):
     """종신보험 KNN 추천 (머신러닝 기반)"""
     try:
+        life_engine = engine_registry.get("life")
         if life_engine is None:
             raise HTTPException(status_code=503, detail="종신보험 추천 엔진이 초기화되지 않았습니다.")
         
         logger.info(f"종신보험 추천 요청: 성별={request.gender}, 나이={request.age}, 직업={request.job}")
         
-        recommendations = life_engine.recommend(
+        recommendations = await run_engine_cached(
+            "종신보험",
+            request,
+            life_engine,
+            "recommend",
             gender_input=request.gender,
             premium=request.desiredPremium,
             coverage=request.desiredCoverage,
@@ -381,74 +385,153 @@ async def recommend_life_insurance(request: LifeInsuranceRequest):
         raise HTTPException(status_code=500, detail=f"종신보험 추천 중 오류가 발생했습니다: {str(e)}")
 
 
+@app.post("/recommend/life/batch")
+async def recommend_life_insurance_batch(request: LifeInsuranceBatchRequest):
+    """
+    종신보험 KNN 일괄 추천 (대량 캠페인용)
+    
+    프로필마다 한 줄씩 NDJSON으로 스트리밍:
+    {"index": 0, "success": true, "total_products": 5, "recommendations": [...]}
+    """
+    # 스트리밍 도중 재로딩되어도 시작 시점의 엔진으로 끝까지 처리
+    engine = engine_registry.get("life")
+    if engine is None:
+        raise HTTPException(status_code=503, detail="종신보험 추천 엔진이 초기화되지 않았습니다.")
+    
+    logger.info(f"종신보험 일괄 추천 요청: {len(request.profiles)}건")
+    
+    profiles = [
+        {
+            "gender_input": profile.gender,
+            "premium": profile.desiredPremium,
+            "coverage": profile.desiredCoverage,
+            "age": profile.age,
+            "job_text": profile.job,
+            "k": profile.topk,
+            "sort_by": profile.sortBy
+        }
+        for profile in request.profiles
+    ]
+    
+    def run_chunk(start):
+        # 청크마다 엔진 실행기를 거쳐 단건 추천과 같은 동시 실행 수 / 대기열 제한을 공유
+        return engine_executor.run(
+            "종신보험", engine, "recommend_chunk", profiles[start:start + BATCH_CHUNK_SIZE], start
+        )
+    
+    # 첫 청크가 대기열 초과로 거절되면 스트리밍 시작 전에 503 응답
+    first_chunk = await run_chunk(0) if profiles else []
+    
+    async def generate():
+        for start in range(0, len(profiles), BATCH_CHUNK_SIZE):
+            try:
+                results = first_chunk if start == 0 else await run_chunk(start)
+            except HTTPException as e:
+                # 스트리밍 중에는 상태 코드를 바꿀 수 없으므로 해당 청크 프로필을 실패로 기록
+                end = min(start + BATCH_CHUNK_SIZE, len(profiles))
+                results = [(index, [], e.detail) for index in range(start, end)]
+            
+            lines = []
+            for index, recommendations, error in results:
+                if error is None:
+                    line = {
+                        "index": index,
+                        "success": True,
+                        "total_products": len(recommendations),
+                        "recommendations": recommendations
+                    }
+                else:
+                    line = {"index": index, "success": False, "message": f"추천 처리 중 오류가 발생했습니다: {error}"}
+                lines.append(json.dumps(line, ensure_ascii=False) + "\n")
+            yield "".join(lines)
+    
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
 # ============================================================
 # 관리자 기능
 # ============================================================
 
 @app.post("/admin/reload-data")
 async def reload_data():
-    """관리자용: 모든 엔진 데이터 재로딩"""
-    global savings_engine, simple_cancer_engine, cancer_engine, accident_engine, life_engine
+    """
+    관리자용: 모든 엔진 데이터 재로딩
+    
+    새 엔진 스냅샷을 백그라운드 스레드에서 모두 만든 뒤 한 번에 교체하므로
+    재로딩 중에도 기존 요청은 이전 버전 엔진으로 계속 처리됨
+    """
+    if engine_registry.reloading:
+        raise HTTPException(status_code=409, detail="이미 데이터 재로딩이 진행 중입니다.")
     
     try:
         logger.info("=" * 50)
         logger.info("관리자 요청: 데이터 재로딩 시작...")
         logger.info("=" * 50)
         
-        reloaded_engines = []
+        engine_set = await engine_registry.reload()
         
-        # 각 엔진별 재로딩
-        engines_to_reload = [
-            ('cancer_engine', 'PersonalizedCancerEngine', '암보험 추천 엔진'),
-            ('savings_engine', 'SavingsInsuranceEngine', '저축성보험 추천 엔진'),
-            ('pension_engine', 'SavingsRecommendationEngine', '연금보험 추천 엔진'),
-            ('accident_engine', 'AccidentInsuranceEngine', '상해보험 추천 엔진'),
-            ('life_engine', 'LifeInsuranceEngine', '종신보험 KNN 추천 엔진'),
-        ]
+        # 이전 데이터로 계산된 추천 결과 무효화 (프로세스 풀 워커의 엔진도 새로 로드)
+        recommendation_cache.clear()
+        engine_executor.reset_process_pool()
         
-        for module_name, class_name, display_name in engines_to_reload:
-            try:
-                if module_name in sys.modules:
-                    importlib.reload(sys.modules[module_name])
-                
-                module = __import__(module_name, fromlist=[class_name])
-                engine_class = getattr(module, class_name)
-                
-                # 엔진별로 적절한 전역 변수에 할당
-                if module_name == 'cancer_engine':
-                    cancer_engine = engine_class()
-                    simple_cancer_engine = engine_class()
-                elif module_name == 'savings_engine':
-                    savings_engine = engine_class()
-                elif module_name == 'pension_engine':
-                    savings_engine = engine_class()
-                elif module_name == 'accident_engine':
-                    accident_engine = engine_class()
-                elif module_name == 'life_engine':
-                    life_engine = engine_class()
-                
-                reloaded_engines.append(display_name)
-                logger.info(f"✓ {display_name} 재로딩 완료")
-                
-            except Exception as e:
-                logger.warning(f"✗ {display_name} 재로딩 실패: {e}")
+        reloaded_engines = [
+            report["name"] for report in engine_set.build_report.values() if report["success"]
+        ]
         
         logger.info("=" * 50)
-        logger.info(f"데이터 재로딩 완료! 재로딩된 엔진: {len(reloaded_engines)}개")
+        logger.info(f"데이터 재로딩 완료! 재로딩된 엔진: {len(reloaded_engines)}개 (v{engine_set.version})")
         logger.info("=" * 50)
         
         return {
             "success": True,
             "message": "데이터가 성공적으로 재로딩되었습니다.",
             "reloaded_engines": reloaded_engines,
-            "total_reloaded": len(reloaded_engines)
+            "total_reloaded": len(reloaded_engines),
+            "version": engine_set.version,
+            "engines": dict(engine_set.build_report)
         }
         
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         logger.error(f"데이터 재로딩 중 오류: {str(e)}")
         raise HTTPException(status_code=500, detail=f"데이터 재로딩 중 오류가 발생했습니다: {str(e)}")
 
 
+@app.get("/admin/engines")
+async def get_engine_status():
+    """관리자용: 현재 엔진 스냅샷 버전 및 엔진별 빌드 정보"""
+    return engine_registry.status()
+
+
+@app.get("/admin/cache-stats")
+async def get_cache_stats():
+    """관리자용: 추천 결과 캐시 통계"""
+    return recommendation_cache.stats()
+
+
+@app.get("/admin/stats")
+async def get_stats():
+    """관리자용: 엔진 단계별 지연 시간, 엔드포인트별 처리량/오류율/캐시 적중률 (JSON)"""
+    return {
+        **metrics.snapshot(),
+        "cache": recommendation_cache.stats(),
+        "executor": engine_executor.stats()
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus 수집용 지표 (텍스트 노출 형식)"""
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/admin/executor-stats")
+async def get_executor_stats():
+    """관리자용: 엔진 실행기 설정 및 엔진별 대기/거절 현황"""
+    return engine_executor.stats()
+
+
 # ============================================================
 # 메인 실행부
 # ============================================================
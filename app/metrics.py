@@ -0,0 +1,313 @@
+"""
+추천 엔진 지표 수집
+
+엔진 호출별 단계(filter/score/sort/serialize) 소요 시간 히스토그램,
+호출 수, 오류 수, 엔드포인트별 캐시 적중 수를 메모리에 집계하고
+Prometheus 텍스트 형식(/metrics)과 JSON(/admin/stats)으로 제공
+
+사용 예:
+    @metrics.tracked("cancer")             # 엔진 호출 1건
+    def get_recommendations(self, request):
+        ...필터링...
+        metrics.mark("filter")             # 직전 mark(또는 호출 시작) 이후 시간을 filter 단계로 집계
+        ...점수 계산...
+        metrics.mark("score")
+
+같은 단계를 한 호출에서 여러 번 mark하면 합산하여 호출당 한 번만 기록하며,
+tracked 밖에서 호출된 mark()는 아무것도 하지 않으므로
+엔진을 스크립트에서 단독으로 실행해도 영향이 없음
+"""
+import functools
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Tuple
+
+# 지연 시간 히스토그램 버킷 상한 (초)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Histogram:
+    """고정 버킷 히스토그램 (버킷별 개수, 합계, 개수)"""
+
+    __slots__ = ("buckets", "counts", "total", "count")
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 마지막 칸은 +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def cumulative(self) -> List[int]:
+        """Prometheus 형식의 누적 버킷 개수"""
+        result, running = [], 0
+        for c in self.counts:
+            running += c
+            result.append(running)
+        return result
+
+    def quantile(self, q: float) -> float:
+        """버킷 경계 선형 보간으로 근사한 분위수 (초)"""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        running = 0
+        for i, c in enumerate(self.counts):
+            if c and running + c >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - running) / c
+            running += c
+        return self.buckets[-1]
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "sum_seconds": round(self.total, 6),
+            "mean_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "p50_ms": round(self.quantile(0.50) * 1000, 3),
+            "p95_ms": round(self.quantile(0.95) * 1000, 3),
+            "p99_ms": round(self.quantile(0.99) * 1000, 3)
+        }
+
+
+class _Call:
+    """진행 중인 엔진 호출 (단계별 누적 시간)"""
+
+    __slots__ = ("engine", "start", "last", "phases", "error")
+
+    def __init__(self, engine: str, start: float):
+        self.engine = engine
+        self.start = start
+        self.last = start
+        self.phases: Dict[str, float] = {}
+        self.error = False
+
+
+class MetricsRegistry:
+    """프로세스 전역 지표 저장소"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.started_at = time.time()
+        self.reset()
+
+    def reset(self):
+        """모든 지표 초기화"""
+        with self._lock:
+            self._phases: Dict[Tuple[str, str], Histogram] = {}
+            self._calls: Dict[str, Histogram] = {}
+            self._call_errors: Dict[str, int] = {}
+            self._requests: Dict[str, Histogram] = {}
+            self._request_errors: Dict[str, int] = {}
+            self._cache_hits: Dict[str, int] = {}
+            self._cache_misses: Dict[str, int] = {}
+
+    def _histogram(self, table: dict, key) -> Histogram:
+        hist = table.get(key)
+        if hist is None:
+            hist = table[key] = Histogram(self.buckets)
+        return hist
+
+    # ------------------------------------------------------------
+    # 엔진 호출 / 단계
+    # ------------------------------------------------------------
+
+    def _begin(self, engine: str):
+        local = self._local
+        outer = getattr(local, "call", None)
+        local.call = _Call(engine, time.perf_counter())
+        return outer
+
+    def _end(self, outer, failed: bool):
+        local = self._local
+        call = local.call
+        elapsed = time.perf_counter() - call.start
+        local.call = outer
+        with self._lock:
+            self._histogram(self._calls, call.engine).observe(elapsed)
+            for phase, seconds in call.phases.items():
+                self._histogram(self._phases, (call.engine, phase)).observe(seconds)
+            if failed or call.error:
+                self._call_errors[call.engine] = self._call_errors.get(call.engine, 0) + 1
+
+    @contextmanager
+    def track(self, engine: str):
+        """엔진 호출 1건 측정 (예외가 전파되면 오류로 집계)"""
+        outer = self._begin(engine)
+        failed = False
+        try:
+            yield
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            self._end(outer, failed)
+
+    def tracked(self, engine: str):
+        """엔진 메서드 데코레이터 - 호출마다 track(engine)과 같은 측정 적용"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                outer = self._begin(engine)
+                failed = True
+                try:
+                    result = func(*args, **kwargs)
+                    failed = False
+                    return result
+                finally:
+                    self._end(outer, failed)
+            return wrapper
+        return decorator
+
+    def mark(self, phase: str):
+        """직전 mark(또는 호출 시작) 이후 경과 시간을 현재 호출의 phase 단계에 더함"""
+        call = getattr(self._local, "call", None)
+        if call is None:
+            return
+        now = time.perf_counter()
+        call.phases[phase] = call.phases.get(phase, 0.0) + (now - call.last)
+        call.last = now
+
+    def mark_error(self):
+        """엔진 내부에서 처리된 오류를 현재 호출의 오류로 표시"""
+        call = getattr(self._local, "call", None)
+        if call is not None:
+            call.error = True
+
+    # ------------------------------------------------------------
+    # 엔드포인트 요청 / 캐시
+    # ------------------------------------------------------------
+
+    def record_request(self, endpoint: str, seconds: float, error: bool = False):
+        """엔드포인트 요청 1건 (캐시 적중 포함) 집계"""
+        with self._lock:
+            self._histogram(self._requests, endpoint).observe(seconds)
+            if error:
+                self._request_errors[endpoint] = self._request_errors.get(endpoint, 0) + 1
+
+    def record_cache(self, endpoint: str, hit: bool):
+        """엔드포인트별 캐시 적중/미스 집계"""
+        table = self._cache_hits if hit else self._cache_misses
+        with self._lock:
+            table[endpoint] = table.get(endpoint, 0) + 1
+
+    # ------------------------------------------------------------
+    # 출력
+    # ------------------------------------------------------------
+
+    def snapshot(self) -> dict:
+        """JSON 형식 지표 (/admin/stats)"""
+        with self._lock:
+            engines = {}
+            for engine, hist in self._calls.items():
+                errors = self._call_errors.get(engine, 0)
+                engines[engine] = {
+                    **hist.summary(),
+                    "errors": errors,
+                    "error_rate": errors / hist.count if hist.count else 0.0,
+                    "phases": {
+                        phase: h.summary()
+                        for (e, phase), h in sorted(self._phases.items()) if e == engine
+                    }
+                }
+
+            endpoints = {}
+            for endpoint in sorted(set(self._requests) | set(self._cache_hits) | set(self._cache_misses)):
+                hist = self._requests.get(endpoint) or Histogram(self.buckets)
+                errors = self._request_errors.get(endpoint, 0)
+                hits = self._cache_hits.get(endpoint, 0)
+                misses = self._cache_misses.get(endpoint, 0)
+                elapsed = max(time.time() - self.started_at, 1e-9)
+                endpoints[endpoint] = {
+                    **hist.summary(),
+                    "throughput_rps": round(hist.count / elapsed, 3),
+                    "errors": errors,
+                    "error_rate": errors / hist.count if hist.count else 0.0,
+                    "cache_hits": hits,
+                    "cache_misses": misses,
+                    "cache_hit_rate": hits / (hits + misses) if hits + misses else 0.0
+                }
+
+        return {
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "engines": engines,
+            "endpoints": endpoints
+        }
+
+    def render_prometheus(self) -> str:
+        """Prometheus 텍스트 노출 형식 (/metrics)"""
+        lines: List[str] = []
+        with self._lock:
+            self._render_histograms(
+                lines, "insurance_engine_phase_seconds", "엔진 호출 단계별 소요 시간",
+                (({"engine": e, "phase": p}, h) for (e, p), h in sorted(self._phases.items()))
+            )
+            self._render_histograms(
+                lines, "insurance_engine_call_seconds", "엔진 호출 소요 시간",
+                (({"engine": e}, h) for e, h in sorted(self._calls.items()))
+            )
+            self._render_counter(
+                lines, "insurance_engine_errors_total", "엔진 호출 오류 수",
+                (({"engine": e}, self._call_errors.get(e, 0)) for e in sorted(self._calls))
+            )
+            self._render_histograms(
+                lines, "insurance_request_seconds", "엔드포인트 요청 소요 시간 (캐시 적중 포함)",
+                (({"endpoint": e}, h) for e, h in sorted(self._requests.items()))
+            )
+            self._render_counter(
+                lines, "insurance_request_errors_total", "엔드포인트 요청 오류 수",
+                (({"endpoint": e}, self._request_errors.get(e, 0)) for e in sorted(self._requests))
+            )
+            self._render_counter(
+                lines, "insurance_cache_hits_total", "추천 결과 캐시 적중 수",
+                (({"endpoint": e}, n) for e, n in sorted(self._cache_hits.items()))
+            )
+            self._render_counter(
+                lines, "insurance_cache_misses_total", "추천 결과 캐시 미스 수",
+                (({"endpoint": e}, n) for e, n in sorted(self._cache_misses.items()))
+            )
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _labels(labels: dict, extra: str = "") -> str:
+        parts = [f'{k}="{_escape(v)}"' for k, v in labels.items()]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}"
+
+    def _render_histograms(self, lines: List[str], name: str, help_text: str,
+                           items: Iterable[Tuple[dict, Histogram]]):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for labels, hist in items:
+            for bound, count in zip(hist.buckets + (float("inf"),), hist.cumulative()):
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = self._labels(labels, 'le="%s"' % le)
+                lines.append(f"{name}_bucket{bucket_labels} {count}")
+            lines.append(f"{name}_sum{self._labels(labels)} {hist.total!r}")
+            lines.append(f"{name}_count{self._labels(labels)} {hist.count}")
+
+    def _render_counter(self, lines: List[str], name: str, help_text: str,
+                        items: Iterable[Tuple[dict, int]]):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        for labels, value in items:
+            lines.append(f"{name}{self._labels(labels)} {value}")
+
+
+def _escape(value) -> str:
+    """Prometheus 레이블 값 이스케이프"""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+# 앱 전체가 공유하는 지표 저장소
+metrics = MetricsRegistry()
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, Tuple, Any, List
+from typing import Optional, Tuple, Any, List, Dict
 from enum import Enum
 
 
@@ -93,6 +93,8 @@ class HealthCheckResponse(BaseModel):
     status: str
     message: str
     data_loaded: bool
+    ready: bool = True  # 모든 엔진의 첫 초기화 완료 여부
+    engines: Dict[str, str] = {}  # 엔진별 상태 (pending / loading / ready / failed)
 
 # 연금 보험 추천 모델들
 class SavingsPurpose(str, Enum):
@@ -157,3 +159,6 @@ class LifeInsuranceResponse(BaseModel):
     recommendations: List[dict]
 
 
+class LifeInsuranceBatchRequest(BaseModel):
+    """종신보험 KNN 일괄 추천 요청 모델"""
+    profiles: List[LifeInsuranceRequest] = Field(..., description="추천할 사용자 프로필 목록", min_length=1, max_length=10000)
@@ -1,15 +1,25 @@
 import pandas as pd
 import numpy as np
 from typing import List, Optional
-import logging
 
-logger = logging.getLogger(__name__)
+from product_store import ProductStore
+from metrics import metrics
+from engine_logging import EngineLogger, sampled_request
+from top_k import top_k_frame
+from snapshot import load_snapshot, save_snapshot
+
+logger = EngineLogger(__name__)
 
 class SavingsRecommendationEngine:
     """사용자 프로필 기반 연금 보험 추천 엔진"""
     
+    # 전처리 스냅샷 이름 / 버전 (_preprocess_data 변경 시 버전 증가)
+    SNAPSHOT_NAME = "savings"
+    SNAPSHOT_VERSION = 1
+    
     def __init__(self):
         self.df = None
+        self.store = None
         self.load_data()
     
     def load_data(self):
@@ -19,11 +29,21 @@ class SavingsRecommendationEngine:
             import os
             base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
             csv_path = os.path.join(base_path, "data", "csv", "savings.csv")
+            
+            # 최신 스냅샷이 있으면 CSV 파싱과 전처리 생략
+            self.df = load_snapshot(self.SNAPSHOT_NAME, csv_path, self.SNAPSHOT_VERSION)
+            if self.df is not None:
+                logger.info(f"연금 보험 스냅샷 로드 완료: {len(self.df)}개 상품")
+                self._build_store()
+                return
+            
             self.df = pd.read_csv(csv_path, encoding='utf-8-sig')
             
             if self.df is not None and not self.df.empty:
                 logger.info(f"연금 보험 데이터 로드 완료: {len(self.df)}개 상품")
                 self._preprocess_data()
+                save_snapshot(self.SNAPSHOT_NAME, self.df, csv_path, self.SNAPSHOT_VERSION)
+                self._build_store()
             else:
                 logger.warning("연금 보험 데이터가 없습니다.")
                 self.df = None
@@ -66,6 +86,18 @@ class SavingsRecommendationEngine:
         except Exception as e:
             logger.error(f"데이터 전처리 중 오류: {str(e)}")
     
+    def _build_store(self):
+        """요청별 필터링에 사용할 컬럼형 저장소 생성"""
+        self.store = ProductStore(
+            self.df,
+            numeric_columns=['납입보험료', '유지기간', '현재공시이율', '최저보증이율'],
+            categorical_columns=['납입방법', '유니버셜여부'],
+            sorted_columns=['납입보험료'],
+            partition_columns=['납입방법', '유지기간']
+        )
+    
+    @metrics.tracked("pension")
+    @sampled_request
     def get_recommendations(self, age: int, monthly_budget: int, purpose: str, top_n: int = 5) -> List[dict]:
         """사용자 프로필 기반 연금 보험 추천"""
         
@@ -75,33 +107,48 @@ class SavingsRecommendationEngine:
         try:
             # 사용자 프로필에 따른 필터링 및 점수 계산
             filtered_df = self._filter_by_profile(age, monthly_budget, purpose)
+            metrics.mark("filter")
             
             if filtered_df.empty:
                 return []
             
-            # 점수 계산 및 정렬
+            # 점수 계산
             scored_df = self._calculate_profile_score(filtered_df, age, monthly_budget, purpose)
             
-            # 상위 N개 추천
-            top_products = scored_df.head(top_n)
+            # 상위 N개 추천 (점수 내림차순, 동점은 후보 순서 유지)
+            top_products = top_k_frame(scored_df, 'score', top_n)
+            metrics.mark("sort")
             
             # 추천 결과 포맷팅
             recommendations = []
             for _, row in top_products.iterrows():
                 recommendation = self._format_recommendation(row, monthly_budget)
                 recommendations.append(recommendation)
+            metrics.mark("serialize")
             
             return recommendations
             
         except Exception as e:
             logger.error(f"추천 처리 중 오류: {str(e)}")
+            metrics.mark_error()
             return []
     
     def _filter_by_profile(self, age: int, monthly_budget: int, purpose: str) -> pd.DataFrame:
-        """사용자 프로필에 따른 기본 필터링 (관대한 조건)"""
-        filtered_df = self.df.copy()
+        """사용자 프로필에 따른 기본 필터링 (관대한 조건, 인덱스 배열 기반)"""
+        store = self.store
+        idx = store.all_indices()
         
         try:
+            # 목적에 따른 유지기간 조건 (정렬 인덱스의 파티션 단위로 적용)
+            if purpose == "연금준비":
+                # 장기 유지기간(3년 이상) 우선 (5년에서 3년으로 완화)
+                term_filter = lambda method, term: term >= 3
+            elif purpose == "단기저축":
+                # 단기 유지기간(5년 이하) 우선 (3년에서 5년으로 완화)
+                term_filter = lambda method, term: term <= 5
+            else:
+                term_filter = None
+            
             # 예산 필터링을 더 관대하게 수정
             if monthly_budget > 0:
                 # 월 예산을 연간 예산으로 변환 (12개월)
@@ -111,56 +158,130 @@ class SavingsRecommendationEngine:
                 budget_min = annual_budget * 0.5
                 budget_max = annual_budget * 2.0
                 
-                # 납입보험료가 예산 범위 내인 상품만 선택
-                filtered_df = filtered_df[
-                    (filtered_df['납입보험료'] >= budget_min) & 
-                    (filtered_df['납입보험료'] <= budget_max)
-                ]
+                # 납입보험료가 예산 범위 내인 상품만 선택 (정렬 인덱스 구간 조회)
+                idx = store.range('납입보험료', budget_min, budget_max, where=term_filter)
+            elif term_filter is not None:
+                idx = store.select(term_filter(None, store.column('유지기간')), idx)
             
-            # 목적에 따른 필터링을 더 관대하게 수정
-            if purpose == "연금준비":
-                # 장기 유지기간(3년 이상) 우선 (5년에서 3년으로 완화)
-                filtered_df = filtered_df[filtered_df['유지기간'] >= 3]
-            elif purpose == "단기저축":
-                # 단기 유지기간(5년 이하) 우선 (3년에서 5년으로 완화)
-                filtered_df = filtered_df[filtered_df['유지기간'] <= 5]
-            elif purpose == "세제혜택":
+            if purpose == "세제혜택":
                 # 유니버셜 상품이 있으면 우선, 없으면 전체
-                universal_products = filtered_df[filtered_df['유니버셜여부'] == '유니버셜']
-                if len(universal_products) > 0:
-                    filtered_df = universal_products
+                universal_idx = store.select(store.mask('유니버셜여부', '유니버셜'), idx)
+                if len(universal_idx) > 0:
+                    idx = universal_idx
                 # 유니버셜 상품이 없으면 전체 상품 유지
             
             # 나이에 따른 필터링을 더 관대하게 수정
             if age < 30:
                 # 젊은 연령대는 높은 수익률 상품 우선 (조건 완화)
-                high_rate_products = filtered_df[filtered_df['현재공시이율'] >= 1.0]
-                if len(high_rate_products) > 0:
-                    filtered_df = high_rate_products
+                high_rate_idx = store.select(store.column('현재공시이율') >= 1.0, idx)
+                if len(high_rate_idx) > 0:
+                    idx = high_rate_idx
             elif age > 50:
                 # 중장년층은 안정성 우선 (조건 완화)
-                stable_products = filtered_df[filtered_df['최저보증이율'] >= 0.0]
-                if len(stable_products) > 0:
-                    filtered_df = stable_products
+                stable_idx = store.select(store.column('최저보증이율') >= 0.0, idx)
+                if len(stable_idx) > 0:
+                    idx = stable_idx
             
         except Exception as e:
             logger.error(f"필터링 중 오류: {str(e)}")
             # 오류 발생 시 전체 데이터 반환
-            return self.df.copy()
+            return store.frame(store.all_indices())
         
         # 필터링 결과가 비어있으면 전체 데이터 반환
-        if filtered_df.empty:
+        if len(idx) == 0:
             logger.warning("필터링 결과가 비어있어 전체 데이터를 반환합니다.")
-            return self.df.copy()
+            idx = store.all_indices()
         
-        return filtered_df
+        # 최종 후보만 DataFrame으로 생성
+        return store.frame(idx)
     
     def _calculate_profile_score(self, df: pd.DataFrame, age: int, monthly_budget: int, purpose: str) -> pd.DataFrame:
-        """사용자 프로필 기반 점수 계산"""
-        scored_df = df.copy()
+        """사용자 프로필 기반 점수 계산 (컬럼 연산 기반)"""
+        scored_df = df  # 필터링 단계에서 새로 만든 후보 DataFrame
+        
+        try:
+            scores = self._vectorized_profile_scores(scored_df, age, monthly_budget, purpose)
+        except Exception as e:
+            # 벡터 연산 실패 시 행 단위 계산으로 대체 (행별 오류는 기본 점수 처리)
+            logger.error(f"점수 계산 중 오류: {str(e)}")
+            metrics.mark_error()
+            scores = self._calculate_profile_score_rowwise(scored_df, age, monthly_budget, purpose)
+        
+        scored_df['score'] = scores
+        metrics.mark("score")
+        return scored_df
+    
+    @staticmethod
+    def _numeric_column(df: pd.DataFrame, col: str) -> np.ndarray:
+        """숫자 컬럼을 float 배열로 반환 (컬럼이 없으면 row.get 기본값과 같은 0)"""
+        if col not in df.columns:
+            return np.zeros(len(df))
+        return df[col].to_numpy(dtype=float)
+    
+    def _vectorized_profile_scores(self, df: pd.DataFrame, age: int, monthly_budget: int, purpose: str) -> np.ndarray:
+        """
+        _calculate_*_score 헬퍼와 같은 규칙을 컬럼 단위로 계산
+        
+        NaN과의 비교는 False이므로 pd.notna(x) and x >= k 조건은 x >= k로 그대로 옮김
+        """
+        n = len(df)
+        current_rate = self._numeric_column(df, '현재공시이율')
+        guaranteed_rate = self._numeric_column(df, '최저보증이율')
+        term = self._numeric_column(df, '유지기간')
+        premium = self._numeric_column(df, '납입보험료')
+        is_universal = (df['유니버셜여부'] == '유니버셜').to_numpy() if '유니버셜여부' in df.columns else np.zeros(n, dtype=bool)
+        
+        # 1. 수익률 점수: 현재공시이율(최대 60점) + 최저보증이율(최대 40점)
+        rate_score = (
+            np.where(np.isnan(current_rate), 0.0, np.minimum(current_rate * 10, 60))
+            + np.where(np.isnan(guaranteed_rate), 0.0, np.minimum(guaranteed_rate * 15, 40))
+        )
+        
+        # 2. 목적 적합성 점수
+        if purpose == "연금준비":
+            accumulation_rate = self._numeric_column(df, '적립률')
+            purpose_score = (
+                np.select([term >= 5, term >= 3], [30.0, 15.0], 0.0)
+                + np.select([accumulation_rate >= 100, accumulation_rate >= 90], [50.0, 30.0], 0.0)
+            )
+        elif purpose == "단기저축":
+            surrender_value = self._numeric_column(df, '해약환급금')
+            purpose_score = (
+                np.select([term <= 3, term <= 5], [40.0, 20.0], 0.0)
+                + np.where(surrender_value > 0, 30.0, 0.0)
+            )
+        elif purpose == "세제혜택":
+            if '납입방법' in df.columns:
+                is_monthly = df['납입방법'].astype(str).str.contains('월납', regex=False).to_numpy()
+            else:
+                is_monthly = np.zeros(n, dtype=bool)
+            purpose_score = np.where(is_universal, 60.0, 0.0) + np.where(is_monthly, 20.0, 0.0)
+        else:
+            purpose_score = np.zeros(n)
+        
+        # 3. 나이 적합성 점수
+        if age < 30:
+            age_score = np.where(current_rate >= 3.0, 50.0, 0.0) + np.where(term >= 5, 30.0, 0.0)
+        elif age >= 50:
+            age_score = np.where(guaranteed_rate >= 2.0, 50.0, 0.0) + np.where(is_universal, 30.0, 0.0)
+        else:
+            age_score = np.full(n, 40.0)
+        
+        # 4. 예산 적합성 점수
+        if monthly_budget > 0:
+            annual_budget = monthly_budget * 12
+            budget_score = np.select([premium <= annual_budget, premium <= annual_budget * 1.2], [50.0, 30.0], 0.0)
+        else:
+            budget_score = np.zeros(n)
+        
+        # 행 단위 구현과 같은 순서로 가중합
+        return rate_score * 0.4 + purpose_score * 0.3 + age_score * 0.2 + budget_score * 0.1
+    
+    def _calculate_profile_score_rowwise(self, df: pd.DataFrame, age: int, monthly_budget: int, purpose: str) -> List[float]:
+        """행 단위 점수 계산 (검증 기준 구현)"""
         scores = []
         
-        for _, row in scored_df.iterrows():
+        for _, row in df.iterrows():
             score = 0.0
             
             try:
@@ -182,12 +303,12 @@ class SavingsRecommendationEngine:
                 
             except Exception as e:
                 logger.error(f"점수 계산 중 오류: {str(e)}")
+                metrics.mark_error()
                 score = 50.0  # 기본 점수
             
             scores.append(score)
         
-        scored_df['score'] = scores
-        return scored_df.sort_values('score', ascending=False)
+        return scores
     
     def _calculate_rate_score(self, row) -> float:
         """수익률 점수 계산"""
@@ -399,3 +520,45 @@ class SavingsRecommendationEngine:
         except Exception as e:
             logger.error(f"분석 요약 생성 중 오류: {str(e)}")
             return {"error": f"분석 중 오류: {str(e)}"}
+
+
+# === 테스트 및 직접 실행용 ===
+if __name__ == "__main__":
+    # 벡터화된 프로필 점수가 행 단위 구현과 동일한지 검증하고 속도 비교
+    import itertools
+    import sys
+    import time
+    
+    print("=== 연금보험 프로필 점수 검증 및 벤치마크 ===")
+    engine = SavingsRecommendationEngine()
+    
+    mismatches = 0
+    rowwise_time = vectorized_time = 0.0
+    cases = list(itertools.product(
+        [25, 29, 30, 45, 50, 65],
+        [0, 100000, 300000, 1000000, 2000000],
+        ["연금준비", "단기저축", "세제혜택", "기타"]
+    ))
+    for age, budget, purpose in cases:
+        candidates = engine._filter_by_profile(age, budget, purpose)
+        
+        start = time.perf_counter()
+        expected = engine._calculate_profile_score_rowwise(candidates, age, budget, purpose)
+        rowwise_time += time.perf_counter() - start
+        
+        start = time.perf_counter()
+        actual = engine._vectorized_profile_scores(candidates, age, budget, purpose)
+        vectorized_time += time.perf_counter() - start
+        
+        if list(actual) != expected:
+            mismatches += 1
+            print(f"불일치: age={age}, budget={budget}, purpose={purpose}")
+    
+    print(f"검증 완료: {len(cases)}개 조건, 불일치 {mismatches}건")
+    print(f"행 단위: {rowwise_time / len(cases) * 1000:.2f}ms/요청, "
+          f"벡터화: {vectorized_time / len(cases) * 1000:.3f}ms/요청, "
+          f"{rowwise_time / vectorized_time:.0f}배 빠름")
+    
+    # 불일치가 있으면 실패 종료 코드로 끝내 CI/스크립트에서 검출되도록 함
+    if mismatches:
+        sys.exit(1)
@@ -0,0 +1,175 @@
+"""
+읽기 전용 컬럼형 상품 저장소
+
+엔진 로드 시 한 번 생성하여 요청마다 DataFrame 전체를 복사하지 않고
+NumPy 컬럼과 범주형 마스크로 인덱스 배열을 필터링하는 데 사용
+
+예산처럼 구간으로 조회하는 컬럼은 파티션별로 정렬한 SortedIndex를 만들어
+전체 마스크 없이 np.searchsorted로 O(log n + k)에 후보를 찾음
+"""
+import numpy as np
+import pandas as pd
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+class SortedIndex:
+    """
+    숫자 컬럼의 파티션별 정렬 인덱스
+
+    파티션 키(예: 납입방법, 유지기간)마다 값 기준으로 정렬한 배열과 행 번호를 보관하고
+    구간 조회 시 조건에 맞는 파티션에서만 이진 탐색으로 범위를 잘라냄
+    결측값인 행은 어떤 비교도 만족하지 않으므로 인덱스에 넣지 않음
+    """
+
+    def __init__(self, values: np.ndarray, partition_keys: Dict[str, np.ndarray]):
+        """
+        Args:
+            values: 정렬 기준 값 (전체 행)
+            partition_keys: 파티션 컬럼명 -> 전체 행의 값 배열
+        """
+        self.partition_names: Tuple[str, ...] = tuple(partition_keys)
+        self._partitions: List[Tuple[tuple, np.ndarray, np.ndarray]] = []
+
+        valid = np.flatnonzero(~np.isnan(values))
+        if self.partition_names:
+            groups = pd.DataFrame(
+                {name: keys[valid] for name, keys in partition_keys.items()}
+            ).groupby(list(self.partition_names), dropna=False, sort=True).indices
+        else:
+            groups = {(): np.arange(len(valid))}
+
+        for key, positions in groups.items():
+            rows = valid[positions]
+            order = np.argsort(values[rows], kind='stable')
+            rows = ProductStore._freeze(rows[order])
+            sorted_values = ProductStore._freeze(values[rows])
+            key = key if isinstance(key, tuple) else (key,)
+            self._partitions.append((key, sorted_values, rows))
+
+    def partitions(self) -> List[tuple]:
+        """파티션 키 목록"""
+        return [key for key, _, _ in self._partitions]
+
+    def range(self, low: Optional[float] = None, high: Optional[float] = None,
+              where: Optional[Callable[..., bool]] = None) -> np.ndarray:
+        """
+        low <= 값 <= high 인 행 번호를 오름차순으로 반환
+
+        Args:
+            low: 하한 (포함, None이면 제한 없음)
+            high: 상한 (포함, None이면 제한 없음)
+            where: 파티션 키 값을 인자로 받아 조회 대상 여부를 반환하는 함수
+        """
+        chunks = []
+        for key, sorted_values, rows in self._partitions:
+            if where is not None and not where(*key):
+                continue
+            start = 0 if low is None else np.searchsorted(sorted_values, low, side='left')
+            stop = len(rows) if high is None else np.searchsorted(sorted_values, high, side='right')
+            if stop > start:
+                chunks.append(rows[start:stop])
+
+        if not chunks:
+            return np.empty(0, dtype=np.intp)
+        # 기존 마스크 필터와 같은 행 순서를 유지하도록 행 번호 순으로 정렬
+        return np.sort(np.concatenate(chunks))
+
+
+class ProductStore:
+    """상품 데이터를 연속된 NumPy 컬럼과 범주형 불리언 마스크로 보관하는 저장소"""
+
+    def __init__(self, df: pd.DataFrame, numeric_columns: Iterable[str] = (),
+                 categorical_columns: Iterable[str] = (), flag_columns: Iterable[str] = (),
+                 sorted_columns: Iterable[str] = (), partition_columns: Iterable[str] = ()):
+        """
+        초기화 및 컬럼 배열 생성
+
+        Args:
+            df: 전처리가 끝난 상품 DataFrame
+            numeric_columns: float 배열로 보관할 숫자 컬럼
+            categorical_columns: 값별 불리언 마스크를 만들 범주형 컬럼
+            flag_columns: bool 배열로 보관할 플래그 컬럼
+            sorted_columns: 구간 조회용 SortedIndex를 만들 숫자 컬럼 (numeric_columns에 포함)
+            partition_columns: SortedIndex를 나눌 파티션 컬럼
+        """
+        self.df = df
+        self.size = len(df)
+        self._columns: Dict[str, np.ndarray] = {}
+        self._categories: Dict[str, Dict[str, np.ndarray]] = {}
+        self._indexes: Dict[str, SortedIndex] = {}
+        self._empty_mask = self._freeze(np.zeros(self.size, dtype=bool))
+        self._all_indices = self._freeze(np.arange(self.size))
+
+        for col in numeric_columns:
+            if col in df.columns:
+                self._columns[col] = self._freeze(pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=float))
+
+        for col in flag_columns:
+            if col in df.columns:
+                self._columns[col] = self._freeze(df[col].fillna(False).to_numpy(dtype=bool))
+
+        for col in categorical_columns:
+            if col in df.columns:
+                values = df[col].to_numpy()
+                self._categories[col] = {
+                    value: self._freeze(values == value)
+                    for value in pd.unique(values) if pd.notna(value)
+                }
+
+        partition_keys = {
+            col: self._columns[col] if col in self._columns else df[col].to_numpy()
+            for col in partition_columns if col in df.columns
+        }
+        for col in sorted_columns:
+            if col in self._columns:
+                self._indexes[col] = SortedIndex(self._columns[col], partition_keys)
+
+    @staticmethod
+    def _freeze(arr: np.ndarray) -> np.ndarray:
+        """연속 메모리의 읽기 전용 배열로 변환"""
+        arr = np.ascontiguousarray(arr)
+        arr.setflags(write=False)
+        return arr
+
+    def column(self, name: str, idx: Optional[np.ndarray] = None) -> np.ndarray:
+        """컬럼 배열 반환 (idx가 주어지면 해당 행만)"""
+        arr = self._columns[name]
+        return arr if idx is None else arr[idx]
+
+    def mask(self, name: str, value) -> np.ndarray:
+        """범주형 컬럼이 value와 같은 행의 마스크 (없는 값이면 모두 False)"""
+        return self._categories[name].get(value, self._empty_mask)
+
+    def isin(self, name: str, values: Iterable) -> np.ndarray:
+        """범주형 컬럼이 values 중 하나인 행의 마스크"""
+        result = np.zeros(self.size, dtype=bool)
+        for value in values:
+            result |= self.mask(name, value)
+        return result
+
+    def range(self, name: str, low: Optional[float] = None, high: Optional[float] = None,
+              where: Optional[Callable[..., bool]] = None) -> np.ndarray:
+        """
+        정렬 인덱스로 low <= 컬럼 <= high 인 행 인덱스 배열 조회
+
+        Args:
+            name: sorted_columns로 지정한 컬럼
+            low: 하한 (포함, None이면 제한 없음)
+            high: 상한 (포함, None이면 제한 없음)
+            where: 파티션 키 값(partition_columns 순서)을 받아 조회 여부를 반환하는 함수
+        """
+        return self._indexes[name].range(low, high, where)
+
+    def all_indices(self) -> np.ndarray:
+        """전체 행 인덱스 배열"""
+        return self._all_indices
+
+    def select(self, mask: np.ndarray, idx: Optional[np.ndarray] = None) -> np.ndarray:
+        """전체 길이 마스크를 적용해 인덱스 배열을 좁힘"""
+        if idx is None:
+            return np.flatnonzero(mask)
+        return idx[mask[idx]]
+
+    def frame(self, idx: np.ndarray) -> pd.DataFrame:
+        """선택된 행만 담은 새 DataFrame 생성 (후보 집합만 복사)"""
+        return self.df.take(idx)
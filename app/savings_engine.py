@@ -1,12 +1,17 @@
 import pandas as pd
 import numpy as np
-import logging
 from typing import List, Dict, Any, Optional
 from enum import Enum
 import re
 import os
 
-logger = logging.getLogger(__name__)
+from product_store import ProductStore
+from metrics import metrics
+from engine_logging import EngineLogger, sampled_request
+from top_k import top_k_frame
+from snapshot import load_snapshot, save_snapshot
+
+logger = EngineLogger(__name__)
 
 class SavingsPurpose(Enum):
     """저축 목적"""
@@ -20,8 +25,13 @@ class SavingsPurpose(Enum):
 class SavingsInsuranceEngine:
     """저축성보험 추천 엔진"""
     
+    # 전처리 스냅샷 이름 / 버전 (_preprocess_data 변경 시 버전 증가)
+    SNAPSHOT_NAME = "savings_comparison"
+    SNAPSHOT_VERSION = 2
+    
     def __init__(self):
         self.df = None
+        self.store = None
         self.load_data()
     
     def load_data(self):
@@ -30,11 +40,21 @@ class SavingsInsuranceEngine:
             # 절대 경로로 데이터 로드
             base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
             csv_path = os.path.join(base_path, "data", "csv", "savings_comparison.csv")
+            
+            # 최신 스냅샷이 있으면 CSV 파싱과 전처리 생략
+            self.df = load_snapshot(self.SNAPSHOT_NAME, csv_path, self.SNAPSHOT_VERSION)
+            if self.df is not None:
+                logger.info(f"저축성보험 스냅샷 로드 완료: {len(self.df)}개 상품")
+                self._build_store()
+                return
+            
             self.df = pd.read_csv(csv_path, encoding='utf-8-sig')
             
             if self.df is not None and not self.df.empty:
                 logger.info(f"저축성보험 데이터 로드 완료: {len(self.df)}개 상품")
                 self._preprocess_data()
+                save_snapshot(self.SNAPSHOT_NAME, self.df, csv_path, self.SNAPSHOT_VERSION)
+                self._build_store()
             else:
                 logger.warning("저축성보험 데이터가 없습니다.")
                 self.df = None
@@ -72,11 +92,48 @@ class SavingsInsuranceEngine:
                 if col in self.df.columns:
                     self.df[col] = self.df[col].fillna(0)
             
+            # 월 납입금 (상품 행에만 의존하므로 로드 시 한 번 계산)
+            # 일시납은 월 납입 개념이 없으므로 총액, 월납은 납입기간이 유지기간과 같다고 가정하여
+            # 납입보험료(총액) / (유지기간 * 12)
+            term = self.df['유지기간'].to_numpy(dtype=float)
+            term_months = np.where(term > 0, term * 12, 1)
+            premium = self.df['납입보험료'].to_numpy(dtype=float)
+            self.df['monthly_premium_value'] = np.where(
+                (self.df['납입방법'] == '일시납').to_numpy(), premium, premium / term_months
+            )
+            
             logger.info("저축성보험 데이터 전처리 완료")
             
         except Exception as e:
             logger.error(f"데이터 전처리 중 오류: {str(e)}")
     
+    def _build_store(self):
+        """요청별 필터링에 사용할 컬럼형 저장소 생성"""
+        self.store = ProductStore(
+            self.df,
+            numeric_columns=['납입보험료', '유지기간', '최저보증이율', '현재공시이율', 'monthly_premium_value'],
+            categorical_columns=['납입방법', '유니버셜여부'],
+            sorted_columns=['monthly_premium_value'],
+            partition_columns=['납입방법', '유지기간']
+        )
+    
+    def _budget_candidates(self, monthly_limit: float, lump_sum_limit: float) -> np.ndarray:
+        """
+        월 납입금 정렬 인덱스로 예산 이하 상품 조회
+        
+        Args:
+            monthly_limit: 월납/전기납 상품의 월 납입금 상한
+            lump_sum_limit: 일시납 상품의 납입금 상한
+        """
+        store = self.store
+        monthly_idx = store.range('monthly_premium_value', high=monthly_limit,
+                                  where=lambda method, term: method in ('월납', '전기납'))
+        lump_sum_idx = store.range('monthly_premium_value', high=lump_sum_limit,
+                                   where=lambda method, term: method == '일시납')
+        return np.union1d(monthly_idx, lump_sum_idx)
+    
+    @metrics.tracked("savings")
+    @sampled_request
     def get_recommendations(self, age: int, monthly_budget: int, purpose: str, 
                           min_guaranteed_rate: Optional[float] = None,
                           top_n: int = 5) -> List[Dict[str, Any]]:
@@ -86,83 +143,56 @@ class SavingsInsuranceEngine:
             return []
         
         try:
-            # 기본 필터링 (회사 배제 없음)
-            filtered_df = self.df.copy()
-            
-            # 납입금 계산 (납입방법에 따라 다르게 처리)
-            def calculate_monthly_premium(row):
-                """월 납입금 계산 - 일시납과 월납을 구분하여 처리"""
-                if row['납입방법'] == '일시납':
-                    # 일시납은 월 납입 개념이 없으므로 총액을 그대로 반환
-                    return row['납입보험료'] 
-                else:
-                    # 월납 상품의 납입기간이 유지기간과 같다고 가정
-                    term_months = row['유지기간'] * 12 if row['유지기간'] > 0 else 1
-                    # 납입보험료(총액) / (유지기간 * 12) = 월 납입금
-                    return row['납입보험료'] / term_months
-            
-            # '월 납입금' 계산 필드 생성 (일시납은 총액으로 처리)
-            filtered_df['monthly_premium_value'] = filtered_df.apply(calculate_monthly_premium, axis=1)
+            store = self.store
             
-            # 예산 필터링 (보수적 기준 적용)
+            # 필터 완화 단계 (기본 조건 -> 예산 완화 -> 전체), 앞 단계가 비어 있을 때만 다음 단계 조회
             if monthly_budget > 0:
-                # 월납/전기납 상품: 월 납입금이 예산의 1.1배 이하
-                is_monthly = filtered_df['납입방법'].isin(['월납', '전기납'])
-                월납_mask = is_monthly & (filtered_df['monthly_premium_value'] <= monthly_budget * 1.1)
-                
-                # 일시납 상품: 기본적으로 제외 (사용자가 명시적으로 요청한 경우만 허용)
-                일시납_mask = (filtered_df['납입방법'] == '일시납') & \
-                              (filtered_df['monthly_premium_value'] <= monthly_budget * 12)  # 1년치 예산 이하만
-                
-                filtered_df = filtered_df[월납_mask | 일시납_mask]
+                # 기본: 월납/전기납은 월 납입금이 예산의 1.1배 이하,
+                #       일시납은 1년치 예산 이하만 (회사 배제 없음)
+                strict_idx = self._budget_candidates(monthly_budget * 1.1, monthly_budget * 12)
+            else:
+                strict_idx = store.all_indices()
             
-            # 최저보증이율 필터링
+            # 최저보증이율 필터링 (기본 조건에만 적용)
             if min_guaranteed_rate is not None:
-                filtered_df = filtered_df[filtered_df['최저보증이율'] >= min_guaranteed_rate]
+                strict_idx = store.select(store.column('최저보증이율') >= min_guaranteed_rate, strict_idx)
             
-            # 필터링 결과가 비어있으면 예산 필터를 더 완화
-            if filtered_df.empty:
+            idx = strict_idx
+            if len(idx) == 0:
                 logger.warning("필터링 결과가 비어있어 예산 필터를 더 완화합니다.")
-                filtered_df = self.df.copy()
-                # 예산 필터를 더 완화
+                # 완화: 월납/전기납은 월 예산의 2배, 일시납은 2년치 예산까지 (최저보증이율 조건 제외)
                 if monthly_budget > 0:
-                    filtered_df['monthly_premium_value'] = filtered_df.apply(calculate_monthly_premium, axis=1)
-                    
-                    # 월납/전기납 상품: 월 납입금이 월 예산의 2배 이하
-                    is_monthly = filtered_df['납입방법'].isin(['월납', '전기납'])
-                    월납_mask_relaxed = is_monthly & (filtered_df['monthly_premium_value'] <= monthly_budget * 2.0)
-                    
-                    # 일시납 상품: 2년치 예산까지 허용
-                    일시납_mask_relaxed = (filtered_df['납입방법'] == '일시납') & \
-                                         (filtered_df['monthly_premium_value'] <= monthly_budget * 24)
-                    
-                    filtered_df = filtered_df[월납_mask_relaxed | 일시납_mask_relaxed]
-                
-                # 그래도 비어있으면 전체 데이터 사용
-                if filtered_df.empty:
+                    idx = self._budget_candidates(monthly_budget * 2.0, monthly_budget * 24)
+                else:
+                    idx = store.all_indices()
+                if len(idx) == 0:
                     logger.warning("완화된 필터링도 실패하여 전체 데이터를 반환합니다.")
-                    filtered_df = self.df.copy()
-                    # 전체 데이터에도 납입금 계산
-                    filtered_df['monthly_premium_value'] = filtered_df.apply(calculate_monthly_premium, axis=1)
+                    idx = store.all_indices()
+            
+            # 최종 후보만 DataFrame으로 생성
+            filtered_df = store.frame(idx)
+            metrics.mark("filter")
             
             # 점수 계산
-            logger.info(f"필터링된 상품 수: {len(filtered_df)}")
+            logger.debug("필터링된 상품 수: %d", len(filtered_df))
             filtered_df = self._calculate_scores(filtered_df, monthly_budget, purpose)
+            metrics.mark("score")
             
-            # 상위 5개 상품의 점수 로그
-            top_products = filtered_df.nlargest(5, 'final_score')
-            logger.info(f"상위 5개 상품 점수:")
-            for idx, (_, row) in enumerate(top_products.iterrows()):
-                logger.info(f"  {idx+1}. {row['보험회사명']} - {row['상품명']}: {row['final_score']:.2f}점")
+            # 상위 5개 상품의 점수 로그 (디버그 출력 시에만 계산)
+            if logger.debug_enabled():
+                top_products = top_k_frame(filtered_df, 'final_score', 5)
+                logger.debug("상위 5개 상품 점수:")
+                for idx, (_, row) in enumerate(top_products.iterrows()):
+                    logger.debug("  %d. %s - %s: %.2f점", idx + 1, row['보험회사명'], row['상품명'], row['final_score'])
             
             # 목적별 특화된 추천 로직
             recommendations = []
             
             if purpose == "단기저축":
                 # 단기저축: 월납/전기납 상품 우선 선택
-                priority_products = filtered_df[
+                priority_products = top_k_frame(filtered_df[
                     filtered_df['납입방법'].isin(['월납', '전기납'])
-                ].sort_values('final_score', ascending=False)
+                ], 'final_score', top_n)
                 
                 if len(priority_products) < top_n:
                     remaining = filtered_df[~filtered_df.index.isin(priority_products.index)]
@@ -172,9 +202,9 @@ class SavingsInsuranceEngine:
                 
             elif purpose == "장기저축":
                 # 장기저축: 최저보증이율 높은 상품 우선 선택
-                priority_products = filtered_df[
+                priority_products = top_k_frame(filtered_df[
                     filtered_df['최저보증이율'] >= 1.0
-                ].sort_values('final_score', ascending=False)
+                ], 'final_score', top_n)
                 
                 if len(priority_products) < top_n:
                     remaining = filtered_df[~filtered_df.index.isin(priority_products.index)]
@@ -184,10 +214,10 @@ class SavingsInsuranceEngine:
                 
             elif purpose == "노후자금":
                 # 노후자금: 안정성 최우선 (최저보증이율 + 장기 유지)
-                priority_products = filtered_df[
+                priority_products = top_k_frame(filtered_df[
                     (filtered_df['최저보증이율'] >= 0.5) & 
                     (filtered_df['유지기간'] >= 5)
-                ].sort_values('final_score', ascending=False)
+                ], 'final_score', top_n)
                 
                 if len(priority_products) < top_n:
                     remaining = filtered_df[~filtered_df.index.isin(priority_products.index)]
@@ -197,10 +227,10 @@ class SavingsInsuranceEngine:
                 
             elif purpose == "교육자금":
                 # 교육자금: 수익성과 안정성 균형 (현재공시이율 + 최저보증이율)
-                priority_products = filtered_df[
+                priority_products = top_k_frame(filtered_df[
                     (filtered_df['현재공시이율'] >= 2.0) & 
                     (filtered_df['최저보증이율'] >= 0.5)
-                ].sort_values('final_score', ascending=False)
+                ], 'final_score', top_n)
                 
                 if len(priority_products) < top_n:
                     remaining = filtered_df[~filtered_df.index.isin(priority_products.index)]
@@ -214,6 +244,7 @@ class SavingsInsuranceEngine:
             
             # DataFrame으로 변환
             recommendations = pd.DataFrame(recommendations)
+            metrics.mark("sort")
             
             # 결과 변환
             result = []
@@ -235,12 +266,14 @@ class SavingsInsuranceEngine:
                     'recommendation_reason': self._generate_recommendation_reason(row, purpose)
                 }
                 result.append(recommendation)
+            metrics.mark("serialize")
             
-            logger.info(f"저축성보험 추천 상품 {len(result)}개 반환")
+            logger.debug("저축성보험 추천 상품 %d개 반환", len(result))
             return result
             
         except Exception as e:
             logger.error(f"추천 생성 중 오류: {str(e)}")
+            metrics.mark_error()
             return []
     
     def _calculate_scores(self, df: pd.DataFrame, monthly_budget: int, purpose: str) -> pd.DataFrame:
@@ -324,6 +357,7 @@ class SavingsInsuranceEngine:
             
         except Exception as e:
             logger.error(f"점수 계산 중 오류: {str(e)}")
+            metrics.mark_error()
             return df
     
     def _generate_recommendation_reason(self, row: pd.Series, purpose: str) -> str:
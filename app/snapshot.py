@@ -0,0 +1,193 @@
+"""
+전처리 완료 데이터 바이너리 스냅샷
+
+엔진의 `_preprocess_data` 결과를 컬럼별 `.npy` 파일과 manifest.json으로 저장하고,
+원본 CSV의 해시와 전처리 버전이 일치하면 CSV 파싱 없이 메모리 매핑으로 로드
+
+종신보험 KNN 모델 아티팩트(life_knn.joblib)도 같은 디렉토리에 저장
+
+빌드:
+    cd app
+    python snapshot.py          # 오래된 스냅샷만 재생성
+    python snapshot.py --force  # 전체 재생성
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT_VERSION = 1
+SNAPSHOT_DIR = os.environ.get(
+    "INS_SNAPSHOT_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "snapshot")
+)
+
+
+def file_hash(path: str) -> str:
+    """파일 내용의 SHA-256 해시"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _snapshot_path(name: str) -> str:
+    return os.path.join(SNAPSHOT_DIR, name)
+
+
+def _read_manifest(name: str) -> Optional[dict]:
+    manifest_path = os.path.join(_snapshot_path(name), "manifest.json")
+    if not os.path.exists(manifest_path):
+        return None
+    try:
+        with open(manifest_path, encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        logger.warning(f"스냅샷 manifest 읽기 실패 ({name}): {e}")
+        return None
+
+
+def _matches(manifest: Optional[dict], source_digest: str, version: int) -> bool:
+    return (
+        manifest is not None
+        and manifest.get("format_version") == SNAPSHOT_FORMAT_VERSION
+        and manifest.get("version") == version
+        and manifest.get("source_hash") == source_digest
+    )
+
+
+def is_fresh(name: str, source_path: str, version: int) -> bool:
+    """스냅샷이 원본 CSV 및 전처리 버전과 일치하는지 확인"""
+    return _matches(_read_manifest(name), file_hash(source_path), version)
+
+
+def save_snapshot(name: str, df: pd.DataFrame, source_path: str, version: int) -> bool:
+    """
+    전처리된 DataFrame을 스냅샷으로 저장
+
+    Args:
+        name: 스냅샷 이름 (엔진별 고유)
+        df: 전처리가 끝난 DataFrame
+        source_path: 원본 CSV 경로 (해시 계산용)
+        version: 엔진 전처리 로직 버전
+
+    Returns:
+        저장 성공 여부
+    """
+    target = _snapshot_path(name)
+    tmp = None
+    try:
+        # 동시에 저장하는 다른 프로세스와 겹치지 않도록 같은 디렉토리에 고유한 임시 디렉토리 사용
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix=f"{name}.", suffix=".tmp", dir=SNAPSHOT_DIR)
+
+        columns = []
+        for i, col in enumerate(df.columns):
+            series = df[col]
+            entry = {"name": str(col), "file": f"{i}.npy"}
+            if pd.api.types.is_bool_dtype(series.dtype) or pd.api.types.is_numeric_dtype(series.dtype):
+                entry["kind"] = "array"
+                np.save(os.path.join(tmp, entry["file"]), series.to_numpy())
+            else:
+                # 문자열 컬럼: 고정폭 유니코드 배열 + 결측 마스크
+                na_mask = series.isna().to_numpy()
+                values = np.array(['' if na else str(v) for v, na in zip(series.to_numpy(dtype=object), na_mask)], dtype=str)
+                entry["kind"] = "string"
+                entry["na_file"] = f"{i}_na.npy"
+                np.save(os.path.join(tmp, entry["file"]), values)
+                np.save(os.path.join(tmp, entry["na_file"]), na_mask)
+            columns.append(entry)
+
+        np.save(os.path.join(tmp, "index.npy"), df.index.to_numpy())
+
+        manifest = {
+            "format_version": SNAPSHOT_FORMAT_VERSION,
+            "version": version,
+            "source": os.path.basename(source_path),
+            "source_hash": file_hash(source_path),
+            "rows": len(df),
+            "columns": columns
+        }
+        with open(os.path.join(tmp, "manifest.json"), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+        # 완성된 디렉토리로 교체
+        shutil.rmtree(target, ignore_errors=True)
+        os.replace(tmp, target)
+        logger.info(f"스냅샷 저장 완료: {name} ({len(df)}행)")
+        return True
+
+    except Exception as e:
+        logger.warning(f"스냅샷 저장 실패 ({name}): {e}")
+        if tmp is not None:
+            shutil.rmtree(tmp, ignore_errors=True)
+        return False
+
+
+def load_snapshot(name: str, source_path: str, version: int) -> Optional[pd.DataFrame]:
+    """
+    최신 스냅샷이 있으면 메모리 매핑으로 로드
+
+    Returns:
+        전처리된 DataFrame (스냅샷이 없거나 오래된 경우 None)
+    """
+    manifest = _read_manifest(name)
+    if not _matches(manifest, file_hash(source_path), version):
+        return None
+
+    base = _snapshot_path(name)
+    try:
+        data = {}
+        for entry in manifest["columns"]:
+            path = os.path.join(base, entry["file"])
+            if entry["kind"] == "array":
+                data[entry["name"]] = np.load(path, mmap_mode='r')
+            else:
+                values = np.load(path).astype(object)
+                values[np.load(os.path.join(base, entry["na_file"]))] = np.nan
+                data[entry["name"]] = values
+
+        index = pd.Index(np.load(os.path.join(base, "index.npy")))
+        df = pd.DataFrame(data, index=index, columns=[entry["name"] for entry in manifest["columns"]], copy=False)
+        logger.info(f"스냅샷 로드 완료: {name} ({len(df)}행)")
+        return df
+
+    except Exception as e:
+        logger.warning(f"스냅샷 로드 실패 ({name}), CSV로 대체합니다: {e}")
+        return None
+
+
+def build_all(force: bool = False):
+    """모든 엔진 스냅샷 생성 (force=True면 기존 스냅샷 삭제 후 재생성)"""
+    from cancer_engine import PersonalizedCancerEngine
+    from savings_engine import SavingsInsuranceEngine
+    from pension_engine import SavingsRecommendationEngine
+
+    from life_engine import LifeInsuranceEngine, MODEL_ARTIFACT_PATH
+
+    for engine_class in (PersonalizedCancerEngine, SavingsInsuranceEngine, SavingsRecommendationEngine):
+        if force:
+            shutil.rmtree(_snapshot_path(engine_class.SNAPSHOT_NAME), ignore_errors=True)
+        engine_class()
+        print(f"✓ {engine_class.__name__} 스냅샷 준비 완료")
+
+    # 종신보험 KNN 모델 아티팩트
+    if force and os.path.exists(MODEL_ARTIFACT_PATH):
+        os.remove(MODEL_ARTIFACT_PATH)
+    LifeInsuranceEngine()
+    print("✓ LifeInsuranceEngine 모델 아티팩트 준비 완료")
+
+
+if __name__ == "__main__":
+    import sys
+    logging.basicConfig(level=logging.INFO)
+    build_all(force="--force" in sys.argv)
@@ -0,0 +1,66 @@
+"""
+부분 정렬 기반 상위 k개 선택
+
+전체 후보를 정렬하지 않고 np.argpartition으로 k번째 값을 찾은 뒤
+경계 이내 후보만 정렬하여 O(n + m log m) (m: 경계 이내 후보 수)로 상위 k개를 고름
+
+- 동점은 tiebreak(기본: 현재 행 순서)가 작은 쪽이 앞 (안정 정렬과 같은 결과)
+- 결측값(NaN)은 정렬 방향과 관계없이 맨 뒤 (pandas sort_values 기본 동작과 같음)
+
+따라서 top_k_frame(df, col, k)는 df.sort_values(col, ascending=False, kind='stable').head(k)와
+같은 행을 같은 순서로 반환하면서 전체 DataFrame 정렬 사본을 만들지 않음
+"""
+import numpy as np
+import pandas as pd
+from typing import Optional
+
+
+def top_k_indices(values, k: int, descending: bool = False,
+                  tiebreak: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    값 기준 상위 k개의 위치 배열 (정렬 순서)
+
+    Args:
+        values: 정렬 기준 값 배열
+        k: 선택할 개수 (전체보다 크면 전체)
+        descending: True면 큰 값부터
+        tiebreak: 동점 시 오름차순으로 비교할 보조 키 (기본: 위치)
+
+    Returns:
+        values 내 위치 배열 (길이 min(k, len(values)))
+    """
+    key = np.asarray(values, dtype=float)
+    n = len(key)
+    k = max(0, min(int(k), n))
+    if k == 0:
+        return np.empty(0, dtype=np.intp)
+    if descending:
+        key = -key  # NaN은 부호를 바꿔도 NaN이므로 그대로 맨 뒤
+    if tiebreak is None:
+        tiebreak = np.arange(n)
+
+    if k < n:
+        # k번째 값 이하인 후보만 남김 (경계 동점은 모두 포함하여 보조 키로 결정)
+        kth = key[np.argpartition(key, k - 1)[k - 1]]
+        if not np.isnan(kth):
+            cand = np.flatnonzero(key <= kth)
+            order = np.lexsort((tiebreak[cand], key[cand]))[:k]
+            return cand[order]
+
+    return np.lexsort((tiebreak, key))[:k]
+
+
+def top_k_frame(df: pd.DataFrame, column: str, k: int, ascending: bool = False) -> pd.DataFrame:
+    """
+    column 기준 상위 k개 행만 담은 DataFrame (동점은 현재 행 순서 유지)
+
+    Args:
+        df: 후보 DataFrame
+        column: 정렬 기준 컬럼
+        k: 선택할 개수
+        ascending: True면 작은 값부터 (기본: 큰 값부터)
+    """
+    if df.empty:
+        return df  # 점수 계산 전에 비어 있던 후보 (정렬 컬럼이 없을 수 있음)
+    positions = top_k_indices(df[column].to_numpy(dtype=float), k, descending=not ascending)
+    return df.take(positions)
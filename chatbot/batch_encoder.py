@@ -0,0 +1,93 @@
+"""
+질문 임베딩 마이크로 배치 처리
+
+Flask 요청 스레드마다 model.encode([질문])을 따로 호출하는 대신
+요청을 큐에 모아 최대 max_wait_ms 동안 또는 max_batch개가 찰 때까지 기다린 뒤
+model.encode 한 번으로 묶어 계산하고 결과를 각 요청 스레드에 돌려줌
+
+트랜스포머 순전파는 배치 크기가 커져도 시간이 거의 늘지 않으므로 동시 요청이 많을수록 처리량이 늘고,
+단일 요청의 추가 지연은 최대 max_wait_ms로 제한됨
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+BATCH_MAX_SIZE = int(os.environ.get("CHATBOT_BATCH_SIZE", 32))
+BATCH_MAX_WAIT_MS = float(os.environ.get("CHATBOT_BATCH_WAIT_MS", 5))
+
+
+class BatchEncoder:
+    """요청을 모아 한 번에 인코딩하는 백그라운드 워커"""
+
+    def __init__(self, model, max_batch=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS):
+        """
+        Args:
+            model: encode(list[str]) -> ndarray 를 제공하는 문장 임베딩 모델
+            max_batch: 한 번에 인코딩할 최대 질문 수
+            max_wait_ms: 첫 질문 도착 후 다른 질문을 기다리는 최대 시간 (밀리초)
+        """
+        self.model = model
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.max_batch_seen = 0
+        self._worker = threading.Thread(target=self._run, name="batch-encoder", daemon=True)
+        self._worker.start()
+
+    def encode(self, text, timeout=None):
+        """질문 하나의 임베딩 (다른 요청과 묶여 계산될 때까지 대기)"""
+        future = Future()
+        self._queue.put((text, future))
+        return future.result(timeout)
+
+    def _collect(self):
+        """첫 질문을 기다린 뒤 마감 시각까지 들어온 질문을 최대 max_batch개 모음"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+
+            # 같은 배치 안의 중복 질문은 한 번만 인코딩
+            texts = list(dict.fromkeys(text for text, _ in batch))
+            try:
+                embeddings = self.model.encode(texts)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            by_text = dict(zip(texts, embeddings))
+            for text, future in batch:
+                future.set_result(by_text[text])
+
+            with self._lock:
+                self.batches += 1
+                self.items += len(batch)
+                self.max_batch_seen = max(self.max_batch_seen, len(batch))
+
+    def stats(self):
+        """배치 처리 통계"""
+        with self._lock:
+            return {
+                "max_batch": self.max_batch,
+                "max_wait_ms": self.max_wait * 1000,
+                "batches": self.batches,
+                "items": self.items,
+                "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+                "max_batch_seen": self.max_batch_seen,
+                "queued": self._queue.qsize()
+            }
@@ -0,0 +1,181 @@
+"""
+챗봇 답변 임베딩 캐시 및 유사도 검색
+
+- '분류'/'내용' 임베딩을 정규화하여 cache/ 아래 .npy로 저장하고 다음 시작부터는 메모리 맵으로 읽음
+  (파일명에 CSV 내용 해시와 모델 이름이 들어가므로 둘 중 하나가 바뀌면 자동으로 다시 계산)
+- 용어/설명 가중 코사인 유사도는 정규화된 벡터의 가중합 행렬 하나와 질문 벡터의 내적 한 번으로 계산
+  (0.8 * cos(q, t) + 0.2 * cos(q, c) == q · (0.8 * t + 0.2 * c), q·t·c는 모두 단위 벡터)
+- CHATBOT_ANN으로 켠 경우에만 근사 최근접 이웃(HNSW) 인덱스 사용 (hnswlib 필요, 기본은 전체 내적 검색)
+
+사용법 (임베딩 미리 계산):
+    python embedding_store.py
+"""
+import hashlib
+import os
+import re
+
+import numpy as np
+
+basedir = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.environ.get("CHATBOT_CACHE_DIR", os.path.join(basedir, "cache"))
+
+# 용어(80%), 설명(20%) - 질문과 용어의 직접적인 연관성을 더 중요하게 판단
+TERM_WEIGHT = 0.8
+CONTENT_WEIGHT = 0.2
+
+# ANN 인덱스 사용 여부: 0(사용 안 함, 기본) / auto(용어 수 기준) / 1(항상)
+# 근사 검색은 전체 내적 검색과 결과가 다를 수 있으므로 명시적으로 켠 경우에만 사용
+ANN_MODE = os.environ.get("CHATBOT_ANN", "0")
+ANN_MIN_ITEMS = int(os.environ.get("CHATBOT_ANN_MIN_ITEMS", 5000))
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+
+def file_hash(path):
+    """파일 내용 SHA-256 (앞 16자리)"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def model_key(model_name):
+    """
+    캐시 파일명에 쓸 모델 식별자
+
+    로컬 폴더 모델(train.py로 학습한 my_insurance_model 등)은 이름이 같아도 다시 학습될 수 있으므로
+    폴더 내 파일 크기/수정 시각까지 포함
+    """
+    key = re.sub(r"[^0-9A-Za-z._-]+", "_", model_name.strip("/"))
+    if os.path.isdir(model_name):
+        digest = hashlib.sha256()
+        for root, _, files in sorted(os.walk(model_name)):
+            for name in sorted(files):
+                stat = os.stat(os.path.join(root, name))
+                digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+        key = f"{key}-{digest.hexdigest()[:8]}"
+    return key
+
+
+def normalize(vectors):
+    """행 단위 L2 정규화 (영벡터는 그대로 0)"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+class EmbeddingStore:
+    """용어/설명 임베딩 캐시와 가중 코사인 유사도 검색"""
+
+    def __init__(self, model, model_name, csv_path, df, backend="torch"):
+        """
+        Args:
+            model: encode(list[str]) -> ndarray 를 제공하는 문장 임베딩 모델
+            model_name: 모델 이름 또는 로컬 경로 (캐시 키)
+            csv_path: 답변 CSV 경로 (캐시 키)
+            df: '분류', '내용' 컬럼을 가진 답변 DataFrame
+            backend: 추론 백엔드 (torch 외에는 임베딩 값이 조금 다르므로 캐시를 따로 둠)
+        """
+        key = model_key(model_name) if backend == "torch" else f"{model_key(model_name)}-{backend}"
+        self.cache_path = os.path.join(
+            CACHE_DIR, f"embeddings_{key}_{file_hash(csv_path)}.npy"
+        )
+        self.embeddings = self._load_or_encode(model, df)  # (2, n, d): 용어, 설명
+
+        # 가중합 행렬은 한 번만 만들어 둠 (질문마다 행렬-벡터 곱 한 번)
+        self.fused = TERM_WEIGHT * self.embeddings[0] + CONTENT_WEIGHT * self.embeddings[1]
+        self.size = len(self.fused)
+        self.ann = self._build_ann() if self._use_ann() else None
+
+    def _load_or_encode(self, model, df):
+        if os.path.exists(self.cache_path):
+            try:
+                embeddings = np.load(self.cache_path, mmap_mode="r")
+                if embeddings.ndim == 3 and embeddings.shape[:2] == (2, len(df)):
+                    print(f"임베딩 캐시를 불러왔습니다: {os.path.basename(self.cache_path)}")
+                    return embeddings
+            except (OSError, ValueError) as e:
+                print(f"임베딩 캐시를 읽지 못해 다시 계산합니다: {e}")
+
+        print("답변 데이터의 의미를 계산하는 중입니다...")
+        embeddings = np.stack([
+            normalize(model.encode(df["분류"].astype(str).tolist())),
+            normalize(model.encode(df["내용"].astype(str).tolist())),
+        ])
+
+        # 임시 파일에 쓴 뒤 교체하여 동시에 시작한 다른 프로세스가 쓰다 만 파일을 읽지 않도록 함
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, embeddings)
+        os.replace(tmp_path, self.cache_path)
+        print(f"임베딩 캐시를 저장했습니다: {os.path.basename(self.cache_path)}")
+        return np.load(self.cache_path, mmap_mode="r")
+
+    def _use_ann(self):
+        if ANN_MODE == "0" or (ANN_MODE == "auto" and self.size < ANN_MIN_ITEMS):
+            return False
+        if hnswlib is None:
+            print("hnswlib이 설치되어 있지 않아 전체 내적 검색을 사용합니다.")
+            return False
+        return True
+
+    def _build_ann(self):
+        """가중합 벡터의 내적 공간 HNSW 인덱스 (인덱스 파일도 임베딩 캐시 옆에 저장)"""
+        dim = self.fused.shape[1]
+        index = hnswlib.Index(space="ip", dim=dim)
+        index_path = self.cache_path.replace(".npy", ".hnsw")
+        if os.path.exists(index_path):
+            index.load_index(index_path, max_elements=self.size)
+        else:
+            index.init_index(max_elements=self.size, ef_construction=200, M=16)
+            index.add_items(self.fused, np.arange(self.size))
+            index.save_index(index_path)
+        index.set_ef(64)
+        print(f"ANN 인덱스 사용 (용어 {self.size}개)")
+        return index
+
+    def search(self, query_embeddings, k=1):
+        """
+        질문 임베딩별 가중 코사인 유사도 상위 k개
+
+        Args:
+            query_embeddings: (m, d) 또는 (d,) 질문 임베딩 (정규화 전이어도 됨)
+            k: 반환할 후보 수
+
+        Returns:
+            (indices, scores): 각각 (m, k) 배열, 점수 내림차순
+        """
+        queries = normalize(np.atleast_2d(query_embeddings))
+        k = min(k, self.size)
+
+        if self.ann is not None:
+            labels, distances = self.ann.knn_query(queries, k=k)
+            return labels.astype(np.intp), (1.0 - distances).astype(np.float32)  # ip 거리 = 1 - 내적
+
+        scores = queries @ self.fused.T  # (m, n)
+        if k == 1:
+            indices = scores.argmax(axis=1)[:, None]
+        else:
+            indices = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+        return indices, np.take_along_axis(scores, indices, axis=1)
+
+    def best_match(self, query_embedding):
+        """질문 하나의 최고 유사도 답변 위치와 점수"""
+        indices, scores = self.search(query_embedding, k=1)
+        return int(indices[0, 0]), float(scores[0, 0])
+
+
+if __name__ == "__main__":
+    import pandas as pd
+    from sentence_transformers import SentenceTransformer
+
+    model_name = os.environ.get("CHATBOT_MODEL", "jhgan/ko-sroberta-multitask")
+    csv_path = os.path.join(basedir, "보험용어정리_new.csv")
+    df = pd.read_csv(csv_path)
+    store = EmbeddingStore(SentenceTransformer(model_name), model_name, csv_path, df)
+    print(f"{store.cache_path} {tuple(store.embeddings.shape)}")
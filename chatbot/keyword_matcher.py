@@ -0,0 +1,128 @@
+"""
+키워드 매칭용 Aho-Corasick 오토마톤 / 접미사 트라이
+
+'분류' 키워드를 로드 시 한 번만 컴파일하여 질문 길이에만 비례하는 시간으로 매칭
+(용어 수와 무관), 우선순위는 기존 행 순회 방식과 같음
+
+1. 정확히 일치 (1.0): 키워드 == 질문인 첫 행
+2. 키워드가 질문에 포함 (0.8): 질문을 Aho-Corasick 오토마톤으로 한 번 훑어 찾은 키워드 중 가장 앞 행
+3. 질문이 키워드에 포함 (0.7): 모든 키워드의 접미사 트라이에서 질문 경로를 따라간 노드의 가장 앞 행
+"""
+from collections import deque
+
+
+class KeywordMatcher:
+    """행별 키워드 목록으로 만든 읽기 전용 매처"""
+
+    def __init__(self, keyword_lists):
+        """
+        Args:
+            keyword_lists: 행 순서대로 각 행의 키워드 목록 (소문자, 앞뒤 공백 제거된 상태)
+        """
+        self.exact = {}
+        for row, keywords in enumerate(keyword_lists):
+            for keyword in keywords:
+                self.exact.setdefault(keyword, row)
+
+        self._build_automaton(keyword_lists)
+        self._build_suffix_trie(keyword_lists)
+
+    def _build_automaton(self, keyword_lists):
+        """키워드 Aho-Corasick 오토마톤 (노드별로 해당 노드에서 끝나는 키워드의 가장 앞 행)"""
+        goto = [{}]
+        first_row = [None]
+        for row, keywords in enumerate(keyword_lists):
+            for keyword in keywords:
+                node = 0
+                for ch in keyword:
+                    nxt = goto[node].get(ch)
+                    if nxt is None:
+                        nxt = len(goto)
+                        goto[node][ch] = nxt
+                        goto.append({})
+                        first_row.append(None)
+                    node = nxt
+                if first_row[node] is None:
+                    first_row[node] = row
+
+        # 너비 우선으로 실패 링크를 만들며 실패 링크 쪽 출력(더 짧은 접미사 키워드)의 행도 합침
+        # (깊이 1 노드의 실패 링크는 루트, 실패 링크 노드는 항상 더 얕으므로 먼저 처리됨)
+        fail = [0] * len(goto)
+        pending = deque(goto[0].values())
+        while pending:
+            node = pending.popleft()
+            f_row = first_row[fail[node]]
+            if f_row is not None and (first_row[node] is None or f_row < first_row[node]):
+                first_row[node] = f_row
+            for ch, nxt in goto[node].items():
+                f = fail[node]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                pending.append(nxt)
+
+        self._goto = goto
+        self._fail = fail
+        self._first_row = first_row
+
+    def _build_suffix_trie(self, keyword_lists):
+        """모든 키워드 접미사의 트라이 (노드 = 키워드의 부분 문자열, 값 = 그 부분 문자열을 가진 가장 앞 행)"""
+        children = [{}]
+        first_row = [None]
+        for row, keywords in enumerate(keyword_lists):
+            for keyword in keywords:
+                if first_row[0] is None:
+                    first_row[0] = row  # 빈 질문은 모든 키워드에 포함됨
+                for start in range(len(keyword)):
+                    node = 0
+                    for ch in keyword[start:]:
+                        nxt = children[node].get(ch)
+                        if nxt is None:
+                            nxt = len(children)
+                            children[node][ch] = nxt
+                            children.append({})
+                            first_row.append(row)
+                        node = nxt
+        self._sub_children = children
+        self._sub_first_row = first_row
+
+    def find_contained(self, question):
+        """질문에 포함된 키워드가 있는 가장 앞 행 (없으면 None)"""
+        goto, fail, first_row = self._goto, self._fail, self._first_row
+        best = first_row[0]  # 빈 키워드는 모든 질문에 포함됨
+        node = 0
+        for ch in question:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            row = first_row[node]
+            if row is not None and (best is None or row < best):
+                best = row
+        return best
+
+    def find_containing(self, question):
+        """질문을 포함하는 키워드가 있는 가장 앞 행 (없으면 None)"""
+        node = 0
+        for ch in question:
+            node = self._sub_children[node].get(ch)
+            if node is None:
+                return None
+        return self._sub_first_row[node]
+
+    def match(self, question):
+        """
+        질문과 가장 잘 맞는 행과 점수
+
+        Returns:
+            (행 위치, 점수) - 정확히 일치 1.0, 키워드 포함 0.8, 키워드에 포함 0.7 / 없으면 (None, 0.0)
+        """
+        row = self.exact.get(question)
+        if row is not None:
+            return row, 1.0
+        row = self.find_contained(question)
+        if row is not None:
+            return row, 0.8
+        row = self.find_containing(question)
+        if row is not None:
+            return row, 0.7
+        return None, 0.0
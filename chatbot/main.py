@@ -2,16 +2,33 @@ from flask import Flask, request, jsonify
 import pandas as pd
 import os
 
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+from embedding_store import EmbeddingStore
+from query_cache import normalize_question, answer_cache, embedding_cache
+from batch_encoder import BatchEncoder, BATCH_MAX_SIZE
 
 app = Flask(__name__)
 
 # --- 딥러닝 모델 및 데이터 준비 ---
 print("딥러닝 모델을 불러오는 중입니다...")
 
-# 사전학습된 한국어 모델 사용 (빠른 시작)
-model = SentenceTransformer('jhgan/ko-sroberta-multitask')
+# 사전학습된 한국어 모델 사용 (빠른 시작), CHATBOT_MODEL로 학습한 모델(my_insurance_model) 지정 가능
+model_name = os.environ.get('CHATBOT_MODEL', 'jhgan/ko-sroberta-multitask')
+
+# 추론 백엔드: torch(기본, PyTorch fp32) / onnx(ONNX Runtime int8, 첫 실행 시 변환)
+# onnx는 정확도 비교(python onnx_backend.py)를 통과한 모델에서만 사용하고, 아니면 torch로 실행
+backend = os.environ.get('CHATBOT_BACKEND', 'torch')
+model = None
+if backend == 'onnx':
+    from onnx_backend import load_onnx_encoder
+    try:
+        model = load_onnx_encoder(model_name, require_parity=True)
+        backend = 'onnx-int8'
+    except RuntimeError as e:
+        print(f"{e} - PyTorch 백엔드로 실행합니다.")
+if model is None:
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(model_name)
+    backend = 'torch'
 
 print("모델 로딩 완료!")
 
@@ -20,28 +37,43 @@ basedir = os.path.dirname(os.path.abspath(__file__))
 csv_path = os.path.join(basedir, '보험용어정리_new.csv')
 df = pd.read_csv(csv_path)
 
-print("답변 데이터의 의미를 계산하는 중입니다...")
-
-# '분류'와 '내용' 임베딩을 분리하여 생성
-term_embeddings = model.encode(df['분류'].tolist())
-content_embeddings = model.encode(df['내용'].tolist())
+# '분류'와 '내용' 임베딩 (CSV/모델이 바뀌지 않았으면 cache/의 .npy를 메모리 맵으로 재사용)
+store = EmbeddingStore(model, model_name, csv_path, df, backend=backend)
 
 print("의미 계산 완료!")
 
+# 동시에 들어온 질문을 모아 한 번에 인코딩 (CHATBOT_BATCH_SIZE=1이면 요청마다 바로 인코딩)
+batch_encoder = BatchEncoder(model) if BATCH_MAX_SIZE > 1 else None
+
 
 # --- 챗봇 로직 ---
+def encode_question(question):
+    """정규화된 질문의 임베딩 (반복 질문은 캐시에서 바로 반환)"""
+    hit, embedding = embedding_cache.get(question)
+    if not hit:
+        if batch_encoder is not None:
+            embedding = batch_encoder.encode(question)
+        else:
+            embedding = model.encode([question])[0]
+        embedding_cache.set(question, embedding)
+    return embedding
+
+
 def chatbot(question):
-    question_embedding = model.encode([question])
+    # 캐시 키와 모델 입력이 같은 정규화 텍스트이므로 캐시 적중 여부와 관계없이 같은 답변
+    question = normalize_question(question)
+    hit, answer = answer_cache.get(question)
+    if not hit:
+        answer = answer_question(question)
+        answer_cache.set(question, answer)
+    return dict(answer)
 
-    # '용어'와 '설명' 유사도 각각 계산
-    term_similarities = cosine_similarity(question_embedding, term_embeddings)
-    content_similarities = cosine_similarity(question_embedding, content_embeddings)
 
-    # 최종 가중치: 용어(80%), 설명(20%)으로 질문과 용어의 직접적인 연관성을 더 중요하게 판단
-    combined_scores = (term_similarities * 0.8) + (content_similarities * 0.2)
+def answer_question(question):
+    question_embedding = encode_question(question)
 
-    best_match_index = combined_scores.argmax()
-    best_score = combined_scores[0, best_match_index]
+    # 최종 가중치: 용어(80%), 설명(20%) 코사인 유사도를 가중합 행렬과의 내적 한 번으로 계산
+    best_match_index, best_score = store.best_match(question_embedding)
 
     # 임계값(Threshold)
     if best_score > 0.6:
@@ -56,5 +88,15 @@ def chat():
     user_query = data.get("question", "")
     return jsonify(chatbot(user_query))
 
+@app.route("/cache-stats", methods=["GET"])
+def cache_stats():
+    """질문 캐시 적중 통계"""
+    return jsonify({"answers": answer_cache.stats(), "embeddings": embedding_cache.stats()})
+
+@app.route("/encoder-stats", methods=["GET"])
+def encoder_stats():
+    """질문 인코딩 배치 처리 통계"""
+    return jsonify(batch_encoder.stats() if batch_encoder is not None else {"enabled": False})
+
 if __name__ == "__main__":
     app.run(host='0.0.0.0', port=5001)
\ No newline at end of file
@@ -0,0 +1,303 @@
+"""
+ONNX Runtime int8 문장 임베딩 백엔드 (CPU 전용, 선택 사항)
+
+Sentence Transformers 모델(사전학습 모델 또는 train.py로 학습한 my_insurance_model)의
+트랜스포머 본체를 ONNX로 내보내고 동적 int8 양자화(가중치 int8, 활성값은 실행 시 양자화)한 뒤
+ONNX Runtime으로 실행하며, 풀링(평균/CLS/최대)과 정규화는 원래 모델 설정대로 numpy로 계산
+
+변환 결과는 cache/onnx/<모델 키>/ 에 저장되어 다음 시작부터 재사용됨
+(로컬 모델 폴더를 다시 학습하면 모델 키가 바뀌어 자동으로 다시 변환)
+
+필요 패키지: onnx, onnxruntime (변환 시에만 torch, sentence-transformers 추가 필요)
+
+사용법 (정확도 비교 + 지연 시간 벤치마크, PyTorch 경로 대비):
+    python onnx_backend.py
+    python onnx_backend.py --model my_insurance_model --glossary ../data/csv/terms.csv
+
+결과는 변환 폴더의 parity.json에 기록되며, 앱 시작 시 CHATBOT_BACKEND=onnx는
+일치율이 CHATBOT_ONNX_MIN_AGREEMENT(0.95) 이상으로 기록된 모델에서만 사용됨
+"""
+import json
+import os
+import time
+
+import numpy as np
+
+from embedding_store import CACHE_DIR, TERM_WEIGHT, CONTENT_WEIGHT, model_key, normalize
+
+ONNX_DIR = os.path.join(CACHE_DIR, "onnx")
+ONNX_THREADS = int(os.environ.get("CHATBOT_ONNX_THREADS", 0))  # 0이면 ONNX Runtime 기본값
+ENCODER_CONFIG = "encoder.json"
+FP32_FILE = "model.onnx"
+INT8_FILE = "model.int8.onnx"
+PARITY_FILE = "parity.json"
+
+# 앱 시작 시 ONNX 백엔드를 쓰려면 이 일치율 이상의 정확도 비교 결과(parity.json)가 있어야 함
+MIN_AGREEMENT = float(os.environ.get("CHATBOT_ONNX_MIN_AGREEMENT", 0.95))
+
+
+def _pooling_mode(pooling):
+    """Pooling 모듈의 풀링 방식 이름 (sentence-transformers 버전별 API 차이 흡수)"""
+    if pooling is None:
+        return "mean"
+    if hasattr(pooling, "get_pooling_mode_str"):
+        return pooling.get_pooling_mode_str()
+    mode = pooling.pooling_mode
+    return mode if isinstance(mode, str) else "+".join(mode)
+
+
+def export_model(model_name, output_dir):
+    """
+    Sentence Transformers 모델을 ONNX(fp32)로 내보내고 int8로 동적 양자화
+
+    Args:
+        model_name: 모델 이름 또는 로컬 경로
+        output_dir: 결과 저장 폴더 (ONNX 파일, 토크나이저, 풀링 설정)
+    """
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from sentence_transformers import SentenceTransformer
+
+    print(f"ONNX로 변환하는 중입니다: {model_name}")
+    st_model = SentenceTransformer(model_name, device="cpu")
+    transformer = st_model[0]
+    pooling = next((m for m in st_model if type(m).__name__ == "Pooling"), None)
+    normalize_output = any(type(m).__name__ == "Normalize" for m in st_model)
+    pooling_mode = _pooling_mode(pooling)
+    if pooling_mode not in ("mean", "cls", "max"):
+        raise ValueError(f"지원하지 않는 풀링 방식입니다: {pooling_mode}")
+
+    class _Encoder(torch.nn.Module):
+        def __init__(self, auto_model):
+            super().__init__()
+            self.auto_model = auto_model
+
+        def forward(self, input_ids, attention_mask):
+            return self.auto_model(input_ids=input_ids, attention_mask=attention_mask)[0]
+
+    os.makedirs(output_dir, exist_ok=True)
+    fp32_path = os.path.join(output_dir, FP32_FILE)
+    sample = transformer.tokenizer(["보험료"], return_tensors="pt")
+    encoder = _Encoder(transformer.auto_model).eval()
+    with torch.no_grad():
+        torch.onnx.export(
+            encoder,
+            (sample["input_ids"], sample["attention_mask"]),
+            fp32_path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["token_embeddings"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "token_embeddings": {0: "batch", 1: "sequence"},
+            },
+            opset_version=17,  # LayerNormalization 연산자 (onnxruntime 1.13 이상)
+        )
+    quantize_dynamic(fp32_path, os.path.join(output_dir, INT8_FILE), weight_type=QuantType.QInt8)
+
+    transformer.tokenizer.save_pretrained(output_dir)
+    config = {
+        "model_name": model_name,
+        "pooling": pooling_mode,
+        "normalize": normalize_output,
+        "max_seq_length": transformer.max_seq_length,
+    }
+    with open(os.path.join(output_dir, ENCODER_CONFIG), "w", encoding="utf-8") as f:
+        json.dump(config, f, ensure_ascii=False, indent=2)
+    print(f"ONNX 변환 완료: {output_dir}")
+
+
+class OnnxSentenceEncoder:
+    """SentenceTransformer.encode와 같은 형태로 쓰는 ONNX Runtime 인코더"""
+
+    def __init__(self, model_dir, quantized=True):
+        """
+        Args:
+            model_dir: export_model 결과 폴더
+            quantized: True면 int8 모델, False면 fp32 모델 사용
+        """
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        with open(os.path.join(model_dir, ENCODER_CONFIG), encoding="utf-8") as f:
+            self.config = json.load(f)
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+
+        options = ort.SessionOptions()
+        if ONNX_THREADS > 0:
+            options.intra_op_num_threads = ONNX_THREADS
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, INT8_FILE if quantized else FP32_FILE),
+            sess_options=options,
+            providers=["CPUExecutionProvider"],
+        )
+
+    def _pool(self, token_embeddings, attention_mask):
+        mode = self.config["pooling"]
+        mask = attention_mask[:, :, None].astype(np.float32)
+        if mode == "cls":
+            return token_embeddings[:, 0]
+        if mode == "max":
+            return np.where(mask > 0, token_embeddings, -1e9).max(axis=1)
+        # mean (ko-sroberta-multitask 기본): 패딩을 제외한 토큰 평균
+        return (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+    def encode(self, sentences, batch_size=32, **kwargs):
+        """문장 목록의 임베딩 (n, d) float32 배열"""
+        if isinstance(sentences, str):
+            sentences = [sentences]
+        # 길이가 비슷한 문장끼리 묶어 패딩을 줄이고 결과는 원래 순서로 되돌림
+        order = np.argsort([-len(s) for s in sentences], kind="stable")
+        outputs = [None] * len(sentences)
+        for start in range(0, len(sentences), batch_size):
+            batch_index = order[start:start + batch_size]
+            tokens = self.tokenizer(
+                [sentences[i] for i in batch_index],
+                padding=True,
+                truncation=True,
+                max_length=self.config["max_seq_length"],
+                return_tensors="np",
+            )
+            attention_mask = tokens["attention_mask"].astype(np.int64)
+            token_embeddings = self.session.run(None, {
+                "input_ids": tokens["input_ids"].astype(np.int64),
+                "attention_mask": attention_mask,
+            })[0]
+            pooled = self._pool(token_embeddings, attention_mask)
+            if self.config["normalize"]:
+                pooled = normalize(pooled)
+            for i, vector in zip(batch_index, pooled):
+                outputs[i] = vector
+        if not outputs:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.asarray(outputs, dtype=np.float32)
+
+
+def onnx_model_dir(model_name):
+    return os.path.join(ONNX_DIR, model_key(model_name))
+
+
+def verified_parity(model_name, min_agreement=MIN_AGREEMENT):
+    """이 모델의 변환 결과로 기록된 정확도 비교 결과 (없거나 일치율 미달이면 None)"""
+    path = os.path.join(onnx_model_dir(model_name), PARITY_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        result = json.load(f)
+    return result if result.get("top1_agreement", 0.0) >= min_agreement else None
+
+
+def load_onnx_encoder(model_name, quantized=True, require_parity=False):
+    """
+    변환된 ONNX 인코더 로드 (변환 결과가 없으면 먼저 변환)
+
+    Args:
+        require_parity: True면 정확도 비교(python onnx_backend.py)를 통과한 기록이 없을 때 RuntimeError
+    """
+    if require_parity and verified_parity(model_name) is None:
+        raise RuntimeError(
+            f"ONNX 백엔드 정확도 비교 기록이 없거나 일치율이 {MIN_AGREEMENT} 미만입니다 "
+            f"(python onnx_backend.py --model {model_name} 실행 필요)"
+        )
+    model_dir = onnx_model_dir(model_name)
+    if not os.path.exists(os.path.join(model_dir, ENCODER_CONFIG)):
+        export_model(model_name, model_dir)
+    return OnnxSentenceEncoder(model_dir, quantized=quantized)
+
+
+# --- 정확도 비교 / 벤치마크 ---
+def _glossary_questions(df):
+    """'분류'의 각 키워드를 질문으로, 해당 행을 정답으로 사용"""
+    questions, answers = [], []
+    for row, category in enumerate(df["분류"].astype(str)):
+        for keyword in category.split("|"):
+            if keyword.strip():
+                questions.append(keyword.strip())
+                answers.append(row)
+    return questions, answers
+
+
+def _best_matches(model, df, questions):
+    """질문별 (최고 유사도 행, 점수) - 챗봇과 같은 용어 80% / 설명 20% 가중 코사인 유사도"""
+    fused = (TERM_WEIGHT * normalize(model.encode(df["분류"].astype(str).tolist()))
+             + CONTENT_WEIGHT * normalize(model.encode(df["내용"].astype(str).tolist())))
+    scores = normalize(model.encode(questions)) @ fused.T
+    return scores.argmax(axis=1), scores.max(axis=1)
+
+
+def _latency_ms(model, questions, repeat):
+    samples = []
+    for _ in range(repeat):
+        for question in questions:
+            start = time.perf_counter()
+            model.encode([question])
+            samples.append((time.perf_counter() - start) * 1000)
+    start = time.perf_counter()
+    model.encode(questions * repeat)
+    batch_seconds = time.perf_counter() - start
+    return {
+        "p50_ms": round(float(np.percentile(samples, 50)), 2),
+        "p95_ms": round(float(np.percentile(samples, 95)), 2),
+        "batch_throughput_qps": round(len(questions) * repeat / batch_seconds, 1),
+    }
+
+
+def parity_check(model_name, glossary_path, repeat=3, threshold=0.6):
+    """
+    PyTorch 모델과 ONNX int8 모델의 정확도 비교 및 지연 시간 측정
+
+    Returns:
+        결과 dict (임베딩 코사인, 정답/최고 유사도 행 일치율, 임계값 판정 일치율, 지연 시간)
+    """
+    import pandas as pd
+    from sentence_transformers import SentenceTransformer
+
+    df = pd.read_csv(glossary_path)
+    questions, answers = _glossary_questions(df)
+    torch_model = SentenceTransformer(model_name, device="cpu")
+    onnx_model = load_onnx_encoder(model_name)
+
+    texts = questions + df["내용"].astype(str).tolist()
+    cosine = (normalize(torch_model.encode(texts)) * normalize(onnx_model.encode(texts))).sum(axis=1)
+
+    torch_rows, torch_scores = _best_matches(torch_model, df, questions)
+    onnx_rows, onnx_scores = _best_matches(onnx_model, df, questions)
+    answers = np.asarray(answers)
+
+    return {
+        "model": model_name,
+        "glossary": os.path.basename(glossary_path),
+        "questions": len(questions),
+        "embedding_cosine_min": round(float(cosine.min()), 4),
+        "embedding_cosine_mean": round(float(cosine.mean()), 4),
+        "top1_agreement": round(float((torch_rows == onnx_rows).mean()), 4),
+        "threshold_agreement": round(float(((torch_scores > threshold) == (onnx_scores > threshold)).mean()), 4),
+        "score_abs_diff_max": round(float(np.abs(torch_scores - onnx_scores).max()), 4),
+        "accuracy_torch": round(float((torch_rows == answers).mean()), 4),
+        "accuracy_onnx": round(float((onnx_rows == answers).mean()), 4),
+        "latency_torch": _latency_ms(torch_model, questions, repeat),
+        "latency_onnx": _latency_ms(onnx_model, questions, repeat),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    basedir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="ONNX int8 백엔드 정확도 비교 및 벤치마크")
+    parser.add_argument("--model", default=os.environ.get("CHATBOT_MODEL", "jhgan/ko-sroberta-multitask"))
+    # data/csv/terms.csv는 챗봇 답변 데이터(보험용어정리_new.csv)와 같은 용어집
+    parser.add_argument("--glossary", default=os.path.join(basedir, "..", "data", "csv", "terms.csv"))
+    parser.add_argument("--repeat", type=int, default=3, help="지연 시간 측정 반복 횟수")
+    parser.add_argument("--min-agreement", type=float, default=MIN_AGREEMENT,
+                        help="최고 유사도 행 일치율이 이보다 낮으면 종료 코드 1")
+    args = parser.parse_args()
+
+    result = parity_check(args.model, args.glossary, repeat=args.repeat)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+    # 앱 시작 시 CHATBOT_BACKEND=onnx 허용 여부는 이 기록으로 판단
+    with open(os.path.join(onnx_model_dir(args.model), PARITY_FILE), "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    sys.exit(0 if result["top1_agreement"] >= args.min_agreement else 1)
@@ -0,0 +1,85 @@
+"""
+챗봇 질문 캐시
+
+같은 질문("보험료", "갱신형 단점" 등)이 반복되므로 정규화한 질문 텍스트를 키로
+질문 임베딩과 최종 답변을 LRU로 보관하여 반복 질문은 모델을 거치지 않음
+답변 데이터와 모델은 프로세스 수명 동안 바뀌지 않으므로 TTL 없이 크기로만 제한
+"""
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+
+_whitespace = re.compile(r"\s+")
+
+
+def normalize_question(question):
+    """
+    질문 정규화 (유니코드 NFKC, 앞뒤 공백 제거, 연속 공백 축약)
+
+    캐시 키이자 모델 입력으로 사용하므로 의미가 바뀔 수 있는 변환(대소문자 등)은 하지 않음
+    """
+    text = unicodedata.normalize("NFKC", str(question))
+    return _whitespace.sub(" ", text).strip()
+
+
+class QueryCache:
+    """정규화된 질문 -> 값 LRU 캐시 (스레드 안전)"""
+
+    def __init__(self, max_size=1024):
+        """
+        Args:
+            max_size: 최대 저장 항목 수 (초과 시 가장 오래 사용되지 않은 항목 제거, 0이면 사용 안 함)
+        """
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """캐시 조회 - (적중 여부, 값) 반환"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def set(self, key, value):
+        """캐시 저장"""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """캐시 통계"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0
+            }
+
+
+# 최종 답변 캐시 (적중 시 임베딩/검색 모두 생략)
+answer_cache = QueryCache(max_size=int(os.environ.get("CHATBOT_ANSWER_CACHE_SIZE", 1024)))
+
+# 질문 임베딩 캐시 (항목당 임베딩 차원 x 4바이트, 768차원 기준 4096개 약 12MB)
+embedding_cache = QueryCache(max_size=int(os.environ.get("CHATBOT_EMBEDDING_CACHE_SIZE", 4096)))
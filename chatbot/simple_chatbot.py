@@ -2,6 +2,8 @@ from flask import Flask, request, jsonify
 import pandas as pd
 import os
 
+from keyword_matcher import KeywordMatcher
+
 app = Flask(__name__)
 
 print("보험 챗봇 데이터를 불러오는 중입니다...")
@@ -10,41 +12,29 @@ basedir = os.path.dirname(os.path.abspath(__file__))
 csv_path = os.path.join(basedir, '보험용어정리_new.csv')
 df = pd.read_csv(csv_path)
 
+# 키워드는 로드 시 한 번만 정리하여 매처로 컴파일 (질문마다 전체 행을 순회하지 않음)
+keyword_lists = [
+    [keyword.strip() for keyword in str(category).lower().split('|')]
+    for category in df['분류']
+]
+matcher = KeywordMatcher(keyword_lists)
+
 print("데이터 로딩 완료!")
 
 # 간단한 키워드 매칭 챗봇
 def chatbot(question):
     question_lower = question.lower().strip()
     
-    best_match = None
-    best_score = 0
+    # 정확히 일치(1.0) > 키워드가 질문에 포함(0.8) > 질문이 키워드에 포함(0.7), 같은 점수면 앞 행 우선
+    match_index, best_score = matcher.match(question_lower)
     
-    for idx, row in df.iterrows():
-        keywords = str(row['분류']).lower().split('|')
-        
-        # 질문에 키워드가 포함되어 있는지 확인
-        for keyword in keywords:
-            keyword = keyword.strip()
-            
-            # 정확히 일치하는 경우 최우선
-            if keyword == question_lower:
-                return {"answer": f"{row['분류']} : {row['내용']}", "score": 1.0}
-            
-            # 키워드가 질문에 포함되어 있는 경우
-            if keyword in question_lower:
-                score = 0.8
-                if score > best_score:
-                    best_score = score
-                    best_match = row
-            
-            # 질문이 키워드에 포함되어 있는 경우
-            elif question_lower in keyword:
-                score = 0.7
-                if score > best_score:
-                    best_score = score
-                    best_match = row
+    # 정확히 일치하는 경우 최우선
+    if best_score == 1.0:
+        row = df.iloc[match_index]
+        return {"answer": f"{row['분류']} : {row['내용']}", "score": 1.0}
     
-    if best_match is not None and best_score > 0.5:
+    if match_index is not None and best_score > 0.5:
+        best_match = df.iloc[match_index]
         answer = f"{best_match['내용']}"
         return {"answer": answer, "score": float(best_score)}
     else: